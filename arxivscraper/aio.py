@@ -0,0 +1,485 @@
+"""
+asyncio harvesting engine.
+
+`AsyncScraper` takes the same arguments as `Scraper` but fetches pages
+with non-blocking HTTP built on asyncio streams, parses them while they
+arrive and waits with `asyncio.sleep`, so it never blocks the event loop.
+Several harvests can run concurrently in one process and share an
+`AsyncRateLimiter`.
+
+Example:
+```
+    async def main():
+        limiter = AsyncRateLimiter(3)
+        scrapers = [AsyncScraper(category=c, limiter=limiter) for c in ('stat', 'q-fin')]
+        async for record in merge(*(s.aiter_records() for s in scrapers)):
+            ...
+```
+"""
+import asyncio
+import email.message
+import io
+import socket
+import time
+import zlib
+from typing import AsyncIterator, Dict, List, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from .arxivscraper import Scraper, _Stop
+from .parsing import PageFeed
+from .transport import REDIRECT_CODES, clamp
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def _within(awaitable, timeout: float, deadline: float = None):
+    """
+    Await `awaitable`, raising socket.timeout after `timeout` seconds or at
+    the monotonic `deadline`, whichever comes first.
+    """
+    try:
+        timeout = clamp(timeout, deadline)
+    except socket.timeout:
+        awaitable.close()
+        raise
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise socket.timeout("timed out")
+
+
+async def _sleep(seconds: float, cancel=None) -> bool:
+    """
+    Sleep `seconds`; return False if `cancel` (an asyncio or a threading
+    Event) is set in the meantime.
+    """
+    if isinstance(cancel, asyncio.Event):
+        try:
+            await asyncio.wait_for(cancel.wait(), max(seconds, 0))
+        except asyncio.TimeoutError:
+            return True
+        return False
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+    return cancel is None or not cancel.is_set()
+
+
+class AsyncRateLimiter(object):
+    """
+    Limiter spacing the requests of all the coroutines sharing it at least
+    `interval` seconds apart. Like the limiters of `arxivscraper.ratelimit`,
+    `wait()` returns False instead of waiting past `deadline` or once
+    `cancel` is set.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next = 0.0
+
+    async def wait(self, deadline: float = None, cancel=None) -> bool:
+        """Sleep until the next request is allowed."""
+        now = time.monotonic()
+        start = max(now, self._next)
+        if deadline is not None and start > deadline:
+            return False
+        # reserve the slot before sleeping so concurrent callers queue up
+        self._next = start + self.interval
+        return await _sleep(start - now, cancel)
+
+
+class AsyncResponse(object):
+    """A response whose body is read chunk by chunk with `await read()`."""
+
+    def __init__(self, client, key, conn, status: int, reason: str, headers, deadline: float = None):
+        self.client = client
+        self.deadline = deadline
+        self.key = key
+        self.conn = conn
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.done = False
+        self._reader = conn[0]
+        self._remaining = None
+        self._chunked = headers.get("Transfer-Encoding", "").lower() == "chunked"
+        if not self._chunked and headers.get("Content-Length") is not None:
+            self._remaining = int(headers["Content-Length"])
+        self._decompressor = None
+        if headers.get("Content-Encoding", "").lower() == "gzip":
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    async def read(self) -> bytes:
+        """Return the next chunk of the (decompressed) body, b'' at the end."""
+        while not self.done:
+            data = await _within(self._read_raw(), self.client.read_timeout, self.deadline)
+            if not data:
+                self.done = True
+                self.client._release(self.key, self.conn, keep=self._remaining is not None or self._chunked)
+                return self._decompressor.flush() if self._decompressor else b""
+            if self._decompressor is not None:
+                data = self._decompressor.decompress(data)
+            if data:
+                return data
+        return b""
+
+    def close(self):
+        """Drop the connection of a response which is not read to the end."""
+        if not self.done:
+            self.done = True
+            self.client._release(self.key, self.conn, keep=False)
+
+    async def read_all(self) -> bytes:
+        chunks = []
+        while True:
+            chunk = await self.read()
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    async def _read_raw(self) -> bytes:
+        if self._chunked:
+            if self._remaining == 0 or self._remaining is None:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # trailers, up to the blank line
+                    while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b""
+                self._remaining = size
+            data = await self._reader.read(min(self._remaining, CHUNK_SIZE))
+            self._remaining -= len(data)
+            if self._remaining == 0:
+                await self._reader.readline()
+            return data
+        if self._remaining is None:
+            return await self._reader.read(CHUNK_SIZE)
+        if self._remaining == 0:
+            return b""
+        data = await self._reader.read(min(self._remaining, CHUNK_SIZE))
+        if not data:
+            raise ConnectionError("connection closed before the end of the response")
+        self._remaining -= len(data)
+        return data
+
+
+class AsyncHTTPClient(object):
+    """
+    Minimal HTTP/1.1 client on asyncio streams, keeping one idle connection
+    alive per host and asking for gzip compressed responses. It may be
+    shared by concurrent harvests: every request gets a connection of its
+    own until its response is read to the end. Opening a
+    connection may take up to `connect_timeout` seconds and every read up to
+    `read_timeout` seconds (None for no limit).
+    """
+
+    def __init__(
+        self,
+        headers: Dict[str, str] = None,
+        max_redirects: int = 5,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.headers = {"User-Agent": "arxivscraper", "Accept-Encoding": "gzip"}
+        self.headers.update(headers or {})
+        self.max_redirects = max_redirects
+        # host key -> idle (reader, writer); connections of unread responses
+        self._idle = {}
+        self._busy = set()
+
+    async def get(self, url: str, deadline: float = None) -> AsyncResponse:
+        """
+        Send a GET request; raise HTTPError for error statuses. No socket
+        operation outlasts the monotonic `deadline`, if given.
+        """
+        for _ in range(self.max_redirects + 1):
+            response = await self._request(url, deadline)
+            if response.status not in REDIRECT_CODES:
+                break
+            await response.read_all()
+            url = urljoin(url, response.headers["Location"])
+        if response.status >= 400:
+            body = await response.read_all()
+            raise HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+        return response
+
+    async def close(self):
+        for reader, writer in list(self._idle.values()) + list(self._busy):
+            writer.close()
+        self._idle.clear()
+        self._busy.clear()
+
+    def _release(self, key, conn, keep: bool):
+        """Keep `conn` for the next request to the host, or close it"""
+        if conn not in self._busy:
+            return
+        self._busy.discard(conn)
+        if keep and key not in self._idle:
+            self._idle[key] = conn
+        else:
+            conn[1].close()
+
+    async def _connect(self, key: Tuple[str, str, int], deadline: float = None):
+        scheme, host, port = key
+        if key in self._idle:
+            return self._idle.pop(key), True
+        connect = asyncio.open_connection(host, port, ssl=scheme == "https" or None)
+        conn = await _within(connect, self.connect_timeout, deadline)
+        return conn, False
+
+    async def _request(self, url: str, deadline: float = None) -> AsyncResponse:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        headers = dict(self.headers, Host=parts.netloc, Connection="keep-alive")
+        request = "GET %s HTTP/1.1\r\n" % path
+        request += "".join("%s: %s\r\n" % item for item in headers.items()) + "\r\n"
+
+        conn, reused = await self._connect(key, deadline)
+        try:
+            status_line = await self._send(conn, request, deadline)
+            if not status_line and reused:
+                raise ConnectionResetError("kept-alive connection was closed")
+        except OSError as e:
+            conn[1].close()
+            if not reused or isinstance(e, socket.timeout):
+                raise
+            conn, _ = await self._connect(key, deadline)
+            status_line = await self._send(conn, request, deadline)
+
+        self._busy.add(conn)
+        try:
+            version, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+            headers = email.message.Message()
+            while True:
+                line = await _within(conn[0].readline(), self.read_timeout, deadline)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip()] = value.strip()
+            return AsyncResponse(self, key, conn, int(status), reason, headers, deadline)
+        except BaseException:
+            self._release(key, conn, keep=False)
+            raise
+
+    async def _send(self, conn, request: str, deadline: float = None) -> bytes:
+        """Send `request` on `conn` and return the status line of the response"""
+        reader, writer = conn
+        try:
+            writer.write(request.encode("latin-1"))
+            await writer.drain()
+            return await _within(reader.readline(), self.read_timeout, deadline)
+        except BaseException:
+            writer.close()
+            raise
+
+
+class AsyncScraper(Scraper):
+    """
+    Scraper for asyncio applications, see `Scraper` for the arguments.
+
+    `limiter` may be an `AsyncRateLimiter` (or any object with an async
+    `wait()` method); a `RateLimiter` or `FileRateLimiter` also works and
+    waits in a worker thread. The `transport`, `parser` and `cache`
+    arguments are not used: pages are always parsed incrementally while
+    they arrive.
+
+    The client created by the scraper is closed at the end of every
+    harvest; a `client` passed in is left open for the caller to close.
+
+    Example:
+    ```
+        async with AsyncScraper(category='stat', date_from='2017-12-23', date_until='2017-12-25') as scraper:
+            async for record in scraper.aiter_records():
+                ...
+    ```
+    """
+
+    def __init__(self, *args, client: AsyncHTTPClient = None, **kwargs):
+        Scraper.__init__(self, *args, **kwargs)
+        if self.limiter is not None and not callable(getattr(self.limiter, "wait", None)):
+            raise TypeError("limiter must have a wait() method")
+        self._owns_client = client is None
+        if client is None:
+            client = AsyncHTTPClient(connect_timeout=self.connect_timeout, read_timeout=self.read_timeout)
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connections of the HTTP client."""
+        await self.client.close()
+
+    async def aiter_pages(self) -> AsyncIterator[List[Dict]]:
+        """Yield the (filtered) records of each page as a list."""
+        async for page in self._aiter_oai_pages():
+            yield [record for record in page]
+
+    async def aiter_records(self) -> AsyncIterator[Dict]:
+        """Yield record dictionaries one by one, while pages are downloaded."""
+        async for page in self._aiter_oai_pages():
+            for record in page:
+                yield record
+
+    async def ascrape(self) -> List[Dict]:
+        return [record async for record in self.aiter_records()]
+
+    async def _aiter_oai_pages(self):
+        """
+        Yield, for every chunk of every page, the list of records completed
+        by that chunk, closing the client afterwards if the scraper owns it.
+        """
+        try:
+            async for records in self._aharvest():
+                yield records
+        finally:
+            if self._owns_client:
+                await self.client.close()
+
+    async def _aharvest(self):
+        """
+        Harvest for `_aiter_oai_pages`. The checkpoint is saved at the end
+        of every page and the deadline and `cancel` are checked before the
+        next one.
+        """
+        url = self.url
+        k = 1
+        self.emitted = 0
+        self.stopped = None
+        self.resumption_token = None
+        self.complete = False
+        self._deadline = time.monotonic() + self.timeout
+        if self._owns_retry:
+            self.retry.reset()
+        self._retry_mark = (self.retry.retries, self.retry.waited)
+        state = self._load_checkpoint()
+        if state is not None:
+            if state["complete"]:
+                self.complete = True
+                return
+            url = self._next_url(state["token"])
+            self.resumption_token = state["token"]
+            k = state["pages"] + 1
+            self.emitted = state["emitted"]
+        while True:
+            try:
+                self._check_stop()
+                response = await self._afetch(url)
+            except _Stop as e:
+                self.stopped = e.reason
+                return
+            attempt = 0
+            while True:
+                feed = PageFeed()
+                yielded = False
+                try:
+                    while True:
+                        chunk = await response.read()
+                        if not chunk:
+                            break
+                        records = [self._process(record) for record in feed.feed(chunk)]
+                        records = [record for record in records if record]
+                        if records:
+                            yielded = True
+                            self.emitted += len(records)
+                            yield records
+                    break
+                except Exception as e:
+                    # download the page again if none of its records was yielded
+                    response.close()
+                    if isinstance(e, OSError) and self._past_deadline():
+                        self.stopped = "deadline"
+                        return
+                    seconds = None if yielded else self.retry.delay(e, attempt)
+                    if seconds is None:
+                        raise
+                    try:
+                        await self._asleep(seconds)
+                        self.retry.count_wait(seconds)
+                        response = await self._afetch(url)
+                    except _Stop as stop:
+                        self.stopped = stop.reason
+                        return
+                    attempt += 1
+            feed.close()
+            self.resumption_token = feed.token
+            self.complete = feed.token is None
+            self._commit(feed.token, k, self.emitted)
+            k += 1
+            if feed.token is None:
+                break
+            url = self._next_url(feed.token)
+
+    async def _afetch(self, url: str) -> AsyncResponse:
+        """Request `url`, retrying transient errors as `self.retry` allows"""
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                if not await self._await_limiter():
+                    self._check_stop()
+                    raise _Stop("deadline")
+            try:
+                return await self.client.get(url, deadline=self._deadline)
+            except Exception as e:
+                if isinstance(e, OSError) and self._past_deadline():
+                    raise _Stop("deadline")
+                seconds = self.retry.delay(e, attempt)
+                if seconds is None:
+                    raise
+                await self._asleep(seconds)
+                self.retry.count_wait(seconds)
+                attempt += 1
+
+    async def _await_limiter(self) -> bool:
+        """Wait for the limiter; a blocking limiter waits in a worker thread"""
+        if asyncio.iscoroutinefunction(self.limiter.wait):
+            return await self.limiter.wait(deadline=self._deadline, cancel=self.cancel)
+        return await asyncio.to_thread(self.limiter.wait, deadline=self._deadline, cancel=self.cancel)
+
+    async def _asleep(self, seconds: float):
+        """Wait before a retry, unless the deadline or `cancel` comes first"""
+        if time.monotonic() + seconds > self._deadline:
+            raise _Stop("deadline")
+        if not await _sleep(seconds, self.cancel):
+            raise _Stop("cancelled")
+
+
+async def merge(*iterators: AsyncIterator) -> AsyncIterator:
+    """
+    Run several async iterators (e.g. `aiter_records()` of several
+    AsyncScrapers) concurrently and yield their items as they arrive.
+    """
+    queue = asyncio.Queue(maxsize=1000)
+    done = object()
+
+    async def pump(iterator):
+        try:
+            async for item in iterator:
+                await queue.put(item)
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.ensure_future(pump(iterator)) for iterator in iterators]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+        for task in tasks:
+            # re-raise the errors of the harvests
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
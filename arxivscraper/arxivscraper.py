@@ -7,44 +7,160 @@ Author: Mahdi Sadjadi (sadjadi.seyedmahdi[AT]gmail[DOT]com).
 from __future__ import print_function
 import xml.etree.ElementTree as ET
 import datetime
+import functools
+import io
+import threading
 import time
-import sys
-from typing import Dict, List
+from collections import namedtuple
+from typing import Dict, FrozenSet, Iterator, List, Optional
 
-PYTHON3 = sys.version_info[0] == 3
-if PYTHON3:
-    from urllib.parse import urlencode
-    from urllib.request import urlopen
-    from urllib.error import HTTPError
-else:
-    from urllib import urlencode
-    from urllib2 import HTTPError, urlopen
+from .constants import OAI, ARXIV, BASE, FIELDS
+from .batch import RecordBatch
+from .cache import ResponseCache
+from .categories import CATEGORIES, parse_categories
+from .checkpoint import Checkpoint, HarvestState
+from .filters import compile_filters
+from .parsing import PARSERS, OAIError, StreamPage, TreePage
+from .pipeline import Prefetcher, SelectedPage, scan_token
+from .query import compile_query
+from .retry import RetryPolicy
+from .transport import default_transport
 
-from .constants import OAI, ARXIV, BASE
+
+# Record attribute holding each output field, where the names differ
+ATTRIBUTES = {"categories": "cats"}
+
+_MISSING = object()
+
+# a last page without records
+_EMPTY_PAGE = ('<OAI-PMH xmlns="%s"><ListRecords/></OAI-PMH>' % OAI.strip("{}")).encode()
+_METADATA = OAI + "metadata/" + ARXIV + "arXiv"
+_AUTHOR = ARXIV + "authors/" + ARXIV + "author"
+_KEYNAME = ARXIV + "keyname"
+_FORENAMES = ARXIV + "forenames"
+_SUFFIX = ARXIV + "suffix"
+_AFFILIATION = ARXIV + "affiliation"
+
+Author = namedtuple("Author", ["keyname", "forenames", "suffix", "affiliations"])
+Author.__doc__ = """An author of a record, with the names as written in the metadata"""
+
+
+class _lazy_field(object):
+    """
+    Descriptor extracting a Record field from the xml on first access.
+
+    The value is stored in the slot of the same name prefixed with an
+    underscore, so the xml is only searched once per field.
+    """
+
+    def __init__(self, extract):
+        self.extract = extract
+        self.__doc__ = extract.__doc__
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+        value = getattr(record, self.slot, _MISSING)
+        if value is _MISSING:
+            value = self.extract(record)
+            setattr(record, self.slot, value)
+        return value
 
 
 class Record(object):
     """
     A class to hold a single record from ArXiv
     Each records contains the following properties:
+    id, url, title, abstract, cats, created, updated, doi, authors, affiliation,
+    author_entries, category_set, category_mask
 
     object should be of xml.etree.ElementTree.Element.
+
+    Fields are extracted from the xml the first time they are accessed, so
+    fields which are never used are never parsed. `materialize()` extracts
+    all of them and releases the xml.
     """
 
+    __slots__ = ("xml", "_author_entries", "_category_set", "_category_mask") + tuple(
+        "_" + ATTRIBUTES.get(field, field) for field in FIELDS
+    )
+
     def __init__(self, xml_record):
         """if not isinstance(object,ET.Element):
         raise TypeError("")"""
         self.xml = xml_record
-        self.id = self._get_text(ARXIV, "id")
-        self.url = "https://arxiv.org/abs/" + self.id
-        self.title = self._get_text(ARXIV, "title")
-        self.abstract = self._get_text(ARXIV, "abstract")
-        self.cats = self._get_text(ARXIV, "categories")
-        self.created = self._get_text(ARXIV, "created")
-        self.updated = self._get_text(ARXIV, "updated")
-        self.doi = self._get_text(ARXIV, "doi")
-        self.authors = self._get_authors()
-        self.affiliation = self._get_affiliation()
+
+    @_lazy_field
+    def id(self) -> str:
+        return self._get_text(ARXIV, "id")
+
+    @_lazy_field
+    def url(self) -> str:
+        return "https://arxiv.org/abs/" + self.id
+
+    @_lazy_field
+    def title(self) -> str:
+        return self._get_text(ARXIV, "title")
+
+    @_lazy_field
+    def abstract(self) -> str:
+        return self._get_text(ARXIV, "abstract")
+
+    @_lazy_field
+    def cats(self) -> str:
+        return self._get_text(ARXIV, "categories")
+
+    @_lazy_field
+    def category_set(self) -> FrozenSet[str]:
+        return parse_categories(self.cats)
+
+    @_lazy_field
+    def category_mask(self) -> int:
+        """Bitmask of the categories over `categories.CATEGORIES`"""
+        return CATEGORIES.mask(self.category_set)
+
+    @_lazy_field
+    def created(self) -> str:
+        return self._get_text(ARXIV, "created")
+
+    @_lazy_field
+    def updated(self) -> str:
+        return self._get_text(ARXIV, "updated")
+
+    @_lazy_field
+    def doi(self) -> str:
+        return self._get_text(ARXIV, "doi")
+
+    @_lazy_field
+    def author_entries(self) -> List[Author]:
+        return self._get_author_entries()
+
+    @_lazy_field
+    def authors(self) -> List:
+        return [
+            (a.forenames or "n/a").lower() + " " + (a.keyname or "n/a").lower()
+            for a in self.author_entries
+        ]
+
+    @_lazy_field
+    def affiliation(self) -> List:
+        return [aff.lower() for a in self.author_entries for aff in a.affiliations]
+
+    def materialize(self, fields=None) -> "Record":
+        """Extract every field (or only `fields`) and drop the reference to the xml"""
+        for field in fields or FIELDS:
+            getattr(self, ATTRIBUTES.get(field, field))
+        self.xml = None
+        return self
+
+    def __getitem__(self, field: str):
+        """Value of an output field, e.g. record['categories']"""
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, ATTRIBUTES.get(field, field))
 
     def _get_text(self, namespace: str, tag: str) -> str:
         """Extracts text from an xml field"""
@@ -55,47 +171,101 @@ class Record(object):
         except:
             return ""
 
-    def _get_name(self, parent, attribute) -> str:
-        """Extracts author name from an xml field"""
-        try:
-            return parent.find(ARXIV + attribute).text.lower()
-        except:
-            return "n/a"
-
-    def _get_authors(self) -> List:
-        """Extract name of authors"""
-        authors_xml = self.xml.findall(ARXIV + "authors/" + ARXIV + "author")
-        last_names = [self._get_name(author, "keyname") for author in authors_xml]
-        first_names = [self._get_name(author, "forenames") for author in authors_xml]
-        full_names = [a + " " + b for a, b in zip(first_names, last_names)]
-        return full_names
-
-    def _get_affiliation(self) -> str:
-        """Extract affiliation of authors"""
-        authors = self.xml.findall(ARXIV + "authors/" + ARXIV + "author")
-        try:
-            affiliation = [
-                author.find(ARXIV + "affiliation").text.lower() for author in authors
-            ]
-            return affiliation
-        except:
-            return []
-
-    def output(self) -> Dict:
-        """Data for each paper record"""
-        d = {
-            "title": self.title,
-            "id": self.id,
-            "abstract": self.abstract,
-            "categories": self.cats,
-            "doi": self.doi,
-            "created": self.created,
-            "updated": self.updated,
-            "authors": self.authors,
-            "affiliation": self.affiliation,
-            "url": self.url,
-        }
-        return d
+    def _get_author_entries(self) -> List[Author]:
+        """Extract authors and their affiliations in a single pass"""
+        entries = []
+        for author in self.xml.iterfind(_AUTHOR):
+            keyname = forenames = suffix = None
+            affiliations = []
+            for child in author:
+                text = child.text.strip() if child.text else ""
+                if child.tag == _KEYNAME:
+                    keyname = text
+                elif child.tag == _FORENAMES:
+                    forenames = text
+                elif child.tag == _SUFFIX:
+                    suffix = text
+                elif child.tag == _AFFILIATION:
+                    affiliations.append(text)
+            entries.append(Author(keyname, forenames, suffix, affiliations))
+        return entries
+
+    def output(self, fields=None) -> Dict:
+        """Data for each paper record, restricted to `fields` if given"""
+        return {field: self[field] for field in fields or FIELDS}
+
+
+class _Stop(Exception):
+    """Raised to end a harvest early; `reason` is 'deadline' or 'cancelled'"""
+
+    def __init__(self, reason: str):
+        Exception.__init__(self, reason)
+        self.reason = reason
+
+
+class _AnyEvent(object):
+    """Event-like view of several events, set as soon as one of them is"""
+
+    def __init__(self, *events):
+        self.events = events
+
+    def is_set(self) -> bool:
+        return any(event.is_set() for event in self.events)
+
+    def wait(self, timeout: float = None) -> bool:
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self.is_set():
+            remaining = 0.05 if end is None else end - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.events[0].wait(min(remaining, 0.05))
+        return True
+
+
+class _RetryingStreamPage(object):
+    """
+    A StreamPage downloaded again, as the retry policy allows, if its
+    download fails before any of its records was yielded. If the harvest is
+    stopped while waiting to retry, or the deadline cuts the download short,
+    the page ends early with `stopped` set.
+    """
+
+    def __init__(self, scraper: "Scraper", url: str, k: int):
+        self.token: Optional[str] = None
+        self.stopped = None
+        self._records = self._parse(scraper, scraper._open(url, k), k)
+
+    def __iter__(self) -> Iterator[ET.Element]:
+        return self._records
+
+    def _parse(self, scraper: "Scraper", response, k: int) -> Iterator[ET.Element]:
+        attempt = 0
+        while True:
+            page = StreamPage(response)
+            yielded = False
+            try:
+                for record in page:
+                    yielded = True
+                    yield record
+            except Exception as e:
+                if isinstance(e, OSError) and scraper._past_deadline():
+                    self.stopped = "deadline"
+                    return
+                seconds = None if yielded else scraper.retry.delay(e, attempt)
+                if seconds is None:
+                    raise
+                try:
+                    scraper._sleep(seconds)
+                    scraper.retry.count_wait(seconds)
+                    # after a cache replay the page has another url
+                    response = scraper._open(scraper._page_url, k)
+                except _Stop as stop:
+                    self.stopped = stop.reason
+                    return
+                attempt += 1
+                continue
+            self.token = page.token
+            return
 
 
 class Scraper(object):
@@ -117,12 +287,88 @@ class Scraper(object):
         final date in format 'YYYY-MM-DD'. Updated eprints are included even if
         they were created outside of the given date range. Default: today.
     t: int
-        Waiting time between subsequent calls to API, triggred by Error 503.
+        Waiting time before retrying a failed request when the server sends no
+        Retry-After header; it doubles with every further retry of the request.
+        Default: 30s (ignored if `retry` is given)
     timeout: int
-        Timeout in seconds after which the scraping stops. Default: 300s
+        Wall-clock limit of the harvest in seconds, waits for the limiter and
+        before retries included. Requests in flight are cut short when it is
+        reached: the harvest stops after the last complete page, see
+        `stopped`. Default: 300s
     filter: dictionary
         A dictionary where keys are used to limit the saved results. Possible keys:
-        subcats, author, title, abstract. See the example, below.
+        any of `FIELDS`, e.g. categories, authors, title, abstract. A record is
+        kept if any of the words is found in any of the fields. See the example, below.
+    query: str
+        Boolean query records must match, e.g.
+        'categories:stat.ML AND (abstract:"graph neural" OR title:gnn) AND NOT title:survey'.
+        See `arxivscraper.query`. Combined with `filters` by AND. Default: None
+    parser: str
+        How each OAI page is parsed. 'tree' (default) reads the whole page and
+        builds its element tree, 'stream' parses the response incrementally
+        while it is downloaded and releases every record once it is processed.
+    transport: object
+        Object used to fetch the OAI pages, see `arxivscraper.transport`.
+        Default: a keep-alive, gzip enabled `HTTPTransport`, or a proxy aware
+        `UrllibTransport` if a proxy is set for `base_url` in the environment.
+    limiter: object
+        Politeness limiter consulted before every request, see
+        `arxivscraper.ratelimit`. Default: None (no pacing).
+    checkpoint: str
+        Path of a checkpoint file updated after every page with the resumption
+        token and the number of records already yielded. With `iter_records`
+        and the other iterators, the checkpoint counts the records handed to
+        the consumer; `scrape` saves it when it returns, or once the page is
+        flushed by its sink. Default: None
+    resume: bool
+        Continue the harvest saved in `checkpoint` instead of starting over.
+        The checkpoint must belong to the same category and date range.
+    cache: str
+        Directory (or `arxivscraper.cache.ResponseCache`) where the fetched pages
+        are cached. Pages of date ranges that ended before today use the
+        `closed_ttl` of the cache. Default: None (no cache)
+    base_url: str
+        ListRecords endpoint of the OAI-PMH server. Default: export.arxiv.org
+    fields: list
+        Keys of the returned record dictionaries, a subset of `FIELDS`. Fields
+        which are neither returned nor filtered on are never parsed.
+        Default: None (all fields)
+    state: str
+        Path of a state file (or `arxivscraper.checkpoint.HarvestState`) for
+        incremental harvests. Without `date_from`, the harvest starts from the
+        date the previous complete harvest of the category went up to. The
+        mark is advanced to `date_until` once a complete harvest is flushed by
+        the sink given to `scrape`; without a sink, call `commit_state()`
+        after writing the records. Default: None
+    prefetch: int
+        Number of pages fetched ahead of the consumer. When set, a background
+        thread requests the next page as soon as the current one is downloaded
+        while `parse_workers` threads parse and filter the fetched pages (the
+        `parser` argument is then ignored). Default: 0 (one page at a time)
+    parse_workers: int
+        Number of parsing threads of the prefetch pipeline. Default: 2
+    retry: RetryPolicy
+        Policy deciding which failed requests are retried and when, see
+        `arxivscraper.retry`. The default `RetryPolicy(backoff=t)` is reset at
+        the start of every harvest; a policy given here counts the retries of
+        every harvest using it until its `reset()`.
+    cancel: threading.Event
+        Event (or `asyncio.Event` for `AsyncScraper`) which stops the harvest
+        at the next page boundary once set; it also interrupts waits before
+        retries. Default: None
+    connect_timeout: float
+        Timeout in seconds of opening a connection (default transport only).
+        Default: 30s
+    read_timeout: float
+        Timeout in seconds of every socket read, so a hung connection cannot
+        block the harvest (default transport only). Default: 120s
+
+    A harvest stopped by the `timeout` or by `cancel` returns the records
+    consumed so far; `stopped` is then 'deadline' or 'cancelled' (None when
+    the harvest is complete) and `resumption_token` is the token to continue
+    from, which is also in the checkpoint if any. With `parser='stream'`, the
+    records already yielded from a page cut short by the deadline are yielded
+    again when the harvest is resumed.
 
     Example:
     Returning all eprints from `stat` category:
@@ -143,12 +389,67 @@ class Scraper(object):
         t: int = 30,
         timeout: int = 300,
         filters: Dict[str, str] = {},
+        parser: str = "tree",
+        transport=None,
+        limiter=None,
+        checkpoint: str = None,
+        resume: bool = False,
+        cache=None,
+        base_url: str = BASE,
+        fields: List[str] = None,
+        query: str = None,
+        state=None,
+        prefetch: int = 0,
+        parse_workers: int = 2,
+        retry: RetryPolicy = None,
+        cancel=None,
+        connect_timeout: float = 30,
+        read_timeout: float = 120,
     ):
+        if parser not in PARSERS:
+            raise ValueError(
+                "parser must be one of %s, got %r" % (", ".join(sorted(PARSERS)), parser)
+            )
         self.cat = str(category)
+        self.parser = parser
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        if transport is None:
+            transport = default_transport(base_url, connect_timeout, read_timeout)
+        self.transport = transport
+        self.limiter = limiter
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
+        if resume and checkpoint is None:
+            raise ValueError("resume=True requires a checkpoint")
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.emitted = 0
+        if isinstance(cache, str):
+            cache = ResponseCache(cache)
+        self.cache = cache
+        self.prefetch = prefetch
+        self.parse_workers = parse_workers
         self.t = t
+        self._owns_retry = retry is None
+        self.retry = RetryPolicy(backoff=t) if retry is None else retry
+        self._retry_mark = (0, 0.0)
+        self.cancel = cancel
+        self.stopped = None
+        self.resumption_token = None
+        self.complete = False
+        self._deadline = None
+        # set when the consumer of a prefetching harvest goes away
+        self._halt = None
         self.timeout = timeout
+        if isinstance(state, str):
+            state = HarvestState(state)
+        self.state = state
         DateToday = datetime.date.today()
-        if date_from is None:
+        mark = None if state is None else state.get(self.cat)
+        if date_from is None and mark is not None:
+            self.f = mark
+        elif date_from is None:
             self.f = str(DateToday.replace(day=1))
         else:
             self.f = date_from
@@ -156,8 +457,9 @@ class Scraper(object):
             self.u = str(DateToday)
         else:
             self.u = date_until
+        self.base_url = base_url
         self.url = (
-            BASE
+            self.base_url
             + "from="
             + self.f
             + "&until="
@@ -165,71 +467,419 @@ class Scraper(object):
             + "&metadataPrefix=arXiv&set=%s" % self.cat
         )
         self.filters = filters
-        if not self.filters:
-            self.append_all = True
+        self.query = query
+        predicates = []
+        if self.filters:
+            predicates.append(compile_filters(filters))
+        if self.query:
+            predicates.append(compile_query(query))
+        self.append_all = not predicates
+        if len(predicates) == 1:
+            self.match = predicates[0]
         else:
-            self.append_all = False
-            self.keys = filters.keys()
+            self.match = lambda record: all(p(record) for p in predicates)
+            self.match.fields = frozenset().union(*(p.fields for p in predicates))
+        if fields is not None:
+            unknown = set(fields).difference(FIELDS)
+            if unknown:
+                raise ValueError("unknown fields: %s" % ", ".join(sorted(unknown)))
+        self.fields = fields
 
-    def scrape(self) -> List[Dict]:
+    def iter_pages(self) -> Iterator[List[Dict]]:
+        """
+        Yield the records of each OAI page as soon as the page is parsed.
+
+        Every item is the (filtered) list of record dictionaries of a
+        single ListRecords response, so at most one page is held in
+        memory at a time.
+        """
+        for page in self._iter_oai_pages():
+            yield list(self._filter_page(page))
+
+    def iter_records(self) -> Iterator[Dict]:
+        """
+        Yield record dictionaries one by one, page after page.
+
+        With `parser='stream'` records are yielded while their page is
+        still being downloaded.
+        """
+        for page in self._iter_oai_pages():
+            for record in self._filter_page(page):
+                yield record
+
+    def iter_batches(self) -> Iterator[RecordBatch]:
+        """
+        Yield the (filtered) records of each OAI page as a columnar
+        `RecordBatch`, restricted to `fields`. Use `to_pandas()` or
+        `to_arrow()` to convert a batch into a table.
+        """
+        for page in self._iter_oai_pages():
+            yield self._batch(page)
+
+    def scrape(self, sink=None):
+        """
+        Return the list of all (filtered) record dictionaries. The
+        checkpoint, if any, is saved when the list is returned, also for an
+        interrupted harvest, but not if an error is raised.
+
+        If a `sink` (see `arxivscraper.sinks`) is given, every page is written
+        to it as soon as it is parsed (as a `RecordBatch` for columnar sinks)
+        and only summary statistics are returned. The checkpoint and the
+        high-water mark, if any, are saved once the page is flushed by the
+        sink; the records of a page cut short by the deadline or `cancel`
+        are written without moving either. The sink is flushed but not
+        closed. The statistics include the number of retried requests, the
+        seconds spent waiting before them and, for an interrupted harvest,
+        `stopped` and `resumption_token`.
+        """
         t0 = time.time()
-        tx = time.time()
-        elapsed = 0.0
+        if sink is None:
+            ds = []
+            for page in self._iter_oai_pages(save_checkpoint=False):
+                ds.extend(self._filter_page(page))
+            # the records are handed over only now, and lost if this raises
+            if self._consumed is not None:
+                self._commit(*self._consumed)
+            n = len(ds)
+        else:
+            pages = 0
+            for page in self._iter_oai_pages(save_checkpoint=False):
+                if sink.columnar:
+                    records = self._batch(page)
+                else:
+                    records = list(self._filter_page(page))
+                if getattr(page, "stopped", None) is not None:
+                    # a page cut short: keep its records, but not as progress
+                    sink.write(records)
+                    continue
+                then = functools.partial(
+                    self._commit, page.token, page.number, self.emitted, advance=True
+                )
+                sink.write(records, then=then)
+                pages += 1
+            sink.flush()
+            n = self.emitted
+        t1 = time.time()
+        print("fetching is completed in {0:.1f} seconds.".format(t1 - t0))
+        print("Total number of records {:d}".format(n))
+        if self.stopped is not None:
+            print("harvest {0}; resume from token {1}.".format(self.stopped, self.resumption_token))
+        retries = self.retry.retries - self._retry_mark[0]
+        waited = self.retry.waited - self._retry_mark[1]
+        if retries:
+            print("waited {0:.1f} seconds in {1:d} retries.".format(waited, retries))
+        if sink is None:
+            return ds
+        return {
+            "records": n,
+            "pages": pages,
+            "seconds": t1 - t0,
+            "retries": retries,
+            "waited": waited,
+            "stopped": self.stopped,
+            "resumption_token": self.resumption_token,
+        }
+
+    def _iter_oai_pages(self, save_checkpoint: bool = True):
+        """
+        Fetch the OAI pages of the harvest one after another.
+
+        Each yielded page is an iterable of <record> elements which must be
+        consumed before the next page is requested; its `number` is the
+        position of the page in the harvest. Unless `save_checkpoint` is
+        False, the checkpoint is saved once the consumer moves on.
+
+        When the deadline passes or `cancel` is set, the iteration ends after
+        the page being consumed and `stopped` tells why.
+        """
         url = self.url
-        ds = []
         k = 1
-        while True:
+        self.emitted = 0
+        self.stopped = None
+        self.resumption_token = None
+        self.complete = False
+        # (token, pages, emitted) after the last page fully consumed
+        self._consumed = None
+        self._deadline = time.monotonic() + self.timeout
+        # number of leading pages of this harvest served from the cache
+        self._cached_pages = 0
+        if self._owns_retry:
+            self.retry.reset()
+        self._retry_mark = (self.retry.retries, self.retry.waited)
+        state = self._load_checkpoint()
+        if state is not None:
+            if state["complete"]:
+                print("harvest in checkpoint is already complete.")
+                self.complete = True
+                return
+            self._cached_pages = None
+            url = self._next_url(state["token"])
+            self.resumption_token = state["token"]
+            k = state["pages"] + 1
+            self.emitted = state["emitted"]
+            print("resuming after {:d} records.".format(self.emitted))
+        if self.prefetch:
+            self._halt = threading.Event()
+            pages = Prefetcher(
+                self._open,
+                self._parse_body,
+                self._next_url,
+                url,
+                k,
+                prefetch=self.prefetch,
+                workers=self.parse_workers,
+                stop=self._halt,
+            )
+        else:
+            pages = self._fetch_pages(url, k)
+        try:
+            for page in pages:
+                yield page
+                # drain whatever the consumer left so the token is known
+                for _ in page:
+                    pass
+                k = page.number + 1
+                if getattr(page, "stopped", None) is not None:
+                    raise _Stop(page.stopped)
+                self.resumption_token = page.token
+                self.complete = page.token is None
+                self._consumed = (page.token, page.number, self.emitted)
+                if save_checkpoint:
+                    self._commit(*self._consumed)
+                if page.token is not None:
+                    self._check_stop()
+        except _Stop as e:
+            self.stopped = e.reason
+        except OAIError:
+            # the error response of the k-th page must not be served again
+            if self.cache is not None:
+                self.cache.remove(self.cache.key(self.url, k))
+            raise
 
-            print("fetching up to ", 1000 * k, "records...")
-            try:
-                response = urlopen(url)
-            except HTTPError as e:
-                if e.code == 503:
-                    to = int(e.hdrs.get("retry-after", 30))
-                    print("Got 503. Retrying after {0:d} seconds.".format(self.t))
-                    time.sleep(self.t)
-                    continue
-                else:
-                    raise
+    def _fetch_pages(self, url: str, k: int):
+        """Fetch and parse the pages one after another, starting at the k-th"""
+        while True:
+            if self.parser == "stream":
+                page = _RetryingStreamPage(self, url, k)
+            else:
+                page = TreePage(self._open(url, k))
             k += 1
-            xml = response.read()
-            root = ET.fromstring(xml)
-            records = root.findall(OAI + "ListRecords/" + OAI + "record")
-            for record in records:
-                meta = record.find(OAI + "metadata").find(ARXIV + "arXiv")
-                record = Record(meta).output()
-                if self.append_all:
-                    ds.append(record)
-                else:
-                    save_record = False
-                    for key in self.keys:
-                        for word in self.filters[key]:
-                            if word.lower() in record[key]:
-                                save_record = True
+            page.number = k - 1
 
-                    if save_record:
-                        ds.append(record)
+            yield page
 
-            try:
-                token = root.find(OAI + "ListRecords").find(OAI + "resumptionToken")
-            except:
-                return 1
-            if token is None or token.text is None:
+            if page.token is None:
                 break
             else:
-                url = BASE + "resumptionToken=%s" % token.text
+                url = self._next_url(page.token)
 
-            ty = time.time()
-            elapsed += ty - tx
-            if elapsed >= self.timeout:
-                break
-            else:
-                tx = time.time()
+    def _next_url(self, token: str) -> str:
+        return self.base_url + "resumptionToken=%s" % token
 
-        t1 = time.time()
-        print("fetching is completed in {0:.1f} seconds.".format(t1 - t0))
-        print("Total number of records {:d}".format(len(ds)))
-        return ds
+    def _parse_body(self, body: bytes) -> SelectedPage:
+        """Parse and filter a page in a worker thread of the prefetch pipeline"""
+        page = TreePage(io.BytesIO(body))
+        records = [record.materialize(self.fields) for record in self._selected(page)]
+        return SelectedPage(records, page.token)
+
+    def _open(self, url: str, k: int):
+        """Return the response of the k-th page, from the cache if possible"""
+        self._check_stop()
+        self._page_url = url
+        print("fetching up to ", 1000 * k, "records...")
+        if self.cache is None:
+            return self._fetch(url)
+        # resumption tokens differ between runs, so pages are keyed by position
+        key = self.cache.key(self.url, k)
+        if self._cached_pages == k - 1:
+            closed = self.u < str(datetime.date.today())
+            response = self.cache.open(key, closed=closed)
+            if response is not None:
+                self._cached_pages = k
+                return response
+            # from now on pages come from the network, as one chain, and
+            # only refresh the cache: later cached pages may be of another run
+            self._cached_pages = None
+            if k > 1:
+                # the token in hand comes from a page cached by an earlier run
+                url = self._replay(k)
+                self._page_url = url
+                if url is None:
+                    return io.BytesIO(_EMPTY_PAGE)
+        return self.cache.wrap(key, self._fetch(url))
+
+    def _replay(self, k: int):
+        """
+        Fetch the first k-1 pages again (refreshing their cache entries) and
+        return the url of the k-th page, or None if the list got shorter.
+        """
+        print("cached pages are incomplete, fetching a fresh resumption token...")
+        url = self.url
+        for j in range(1, k):
+            key = self.cache.key(self.url, j)
+            token = scan_token(self.cache.wrap(key, self._fetch(url)).read())
+            if token is None:
+                return None
+            url = self._next_url(token)
+        return url
+
+    def _fetch(self, url: str):
+        """
+        Request `url`, retrying transient errors as `self.retry` allows.
+
+        Unless pages are streamed, the whole body is downloaded within the
+        retried call, so an error halfway through a page is retried too.
+        """
+        if self.parser == "stream" and not self.prefetch:
+            return self.retry.call(self._request, url, sleep=self._sleep)
+        return self.retry.call(self._download, url, sleep=self._sleep)
+
+    def _download(self, url: str) -> io.BytesIO:
+        response = self._request(url)
+        try:
+            return io.BytesIO(response.read())
+        except OSError:
+            if self._past_deadline():
+                raise _Stop("deadline")
+            raise
+
+    def _check_stop(self):
+        """Raise _Stop if the harvest is cancelled or past its deadline"""
+        cancel = self._cancelled()
+        if cancel is not None and cancel.is_set():
+            raise _Stop("cancelled")
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            raise _Stop("deadline")
+
+    def _sleep(self, seconds: float):
+        """Wait before a retry, unless the deadline or `cancel` comes first"""
+        if self._deadline is not None and time.monotonic() + seconds > self._deadline:
+            raise _Stop("deadline")
+        cancel = self._cancelled()
+        if cancel is None:
+            time.sleep(seconds)
+        elif cancel.wait(seconds):
+            raise _Stop("cancelled")
+
+    def _cancelled(self):
+        """
+        Event set once `cancel` is set or the consumer of a prefetching
+        harvest is gone, None if neither can happen.
+        """
+        events = [event for event in (self._halt, self.cancel) if event is not None]
+        if len(events) < 2:
+            return events[0] if events else None
+        return _AnyEvent(*events)
+
+    def _past_deadline(self) -> bool:
+        # socket timeouts shortened to the deadline may fire a little early
+        return self._deadline is not None and time.monotonic() >= self._deadline - 0.01
+
+    def _request(self, url: str):
+        """
+        Send a single request, once the limiter allows it. Socket timeouts
+        are shortened so that the request cannot outlast the deadline.
+        """
+        if self.limiter is not None:
+            if not self.limiter.wait(deadline=self._deadline, cancel=self._cancelled()):
+                self._check_stop()
+                raise _Stop("deadline")
+        try:
+            if getattr(self.transport, "accepts_deadline", False):
+                return self.transport.open(url, deadline=self._deadline)
+            return self.transport.open(url)
+        except OSError:
+            if self._past_deadline():
+                raise _Stop("deadline")
+            raise
+
+    def _filter_page(self, page) -> Iterator[Dict]:
+        """Turn the records of a page into dictionaries, dropping filtered ones"""
+        for record in self._selected(page):
+            yield record.output(self.fields)
+            self.emitted += 1
+
+    def _batch(self, page) -> RecordBatch:
+        """Collect the (filtered) records of a page into a RecordBatch"""
+        batch = RecordBatch(self.fields)
+        for record in self._selected(page):
+            batch.append(record)
+        self.emitted += len(batch)
+        return batch
+
+    def _selected(self, page) -> Iterator[Record]:
+        """Yield the Records of a page which pass the filters"""
+        if getattr(page, "selected", False):
+            # already filtered by a worker of the prefetch pipeline
+            return iter(page)
+        return (record for record in map(self._select, page) if record is not None)
+
+    def _load_checkpoint(self):
+        """Return the checkpoint state to resume from, if any"""
+        if not self.resume:
+            return None
+        state = self.checkpoint.load()
+        if state is None:
+            return None
+        window = (state["category"], state["date_from"], state["date_until"])
+        if window != (self.cat, self.f, self.u):
+            raise ValueError(
+                "checkpoint %s belongs to another harvest: %s from %s until %s"
+                % ((self.checkpoint.path,) + window)
+            )
+        return state
+
+    def commit_state(self):
+        """
+        Advance the high-water mark of `state` to `date_until`. Call it once
+        the records of a complete harvest are safely written.
+        """
+        if self.state is None:
+            raise ValueError("commit_state() requires a state")
+        if not self.complete:
+            raise ValueError("the harvest is not complete")
+        self.state.advance(self.cat, self.u)
+
+    def _commit(self, token, pages: int, emitted: int, advance: bool = False):
+        """
+        Record that the first `pages` pages are consumed: save the checkpoint
+        and, with `advance` and once the harvest is complete, advance the
+        high-water mark.
+        """
+        if advance and self.state is not None and token is None:
+            self.state.advance(self.cat, self.u)
+        if self.checkpoint is None:
+            return
+        self.checkpoint.save(
+            category=self.cat,
+            date_from=self.f,
+            date_until=self.u,
+            token=token,
+            pages=pages,
+            emitted=emitted,
+            complete=token is None,
+        )
+
+    def _process(self, record) -> Dict:
+        """Turn an OAI <record> into a dictionary, or None if filtered out"""
+        record = self._select(record)
+        return None if record is None else record.output(self.fields)
+
+    def _select(self, record) -> Record:
+        """
+        Return the Record of an OAI <record>, or None if filtered out.
+
+        The filters run on the lazy Record before anything else is extracted,
+        so a rejected record only has the fields in `self.match.fields` parsed.
+        """
+        meta = record.find(_METADATA)
+        if meta is None:
+            # deleted records only have a header
+            return None
+        record = Record(meta)
+        if self.append_all or self.match(record):
+            return record
+        return None
 
 
 def search_all(df, col, *words):
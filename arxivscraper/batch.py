@@ -0,0 +1,186 @@
+"""
+Columnar batches of records.
+
+A `RecordBatch` holds the records of one OAI page as one column per
+field instead of one dictionary per record. Ids are stored as one UTF-8
+buffer with offsets, like an Arrow string array, dates as days since
+1970-01-01 and categories as codes of `categories.CATEGORIES` in typed
+arrays laid out like Arrow list arrays (flat values + offsets), so they
+convert to pandas or Arrow without a row to column transpose.
+"""
+import datetime
+from array import array
+from typing import Dict, List, Sequence
+
+from .categories import CATEGORIES
+from .constants import FIELDS, LIST_FIELDS
+
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+# value of a missing date in the date columns
+NULL_DATE = -(2 ** 31)
+DATE_FIELDS = ("created", "updated")
+
+
+def to_days(date: str) -> int:
+    """Days since 1970-01-01 of a 'YYYY-MM-DD' date, NULL_DATE if empty."""
+    if not date:
+        return NULL_DATE
+    return datetime.date(int(date[:4]), int(date[5:7]), int(date[8:10])).toordinal() - EPOCH
+
+
+class RecordBatch(object):
+    """
+    Records of one page stored column by column.
+
+    `columns` maps each field to its column: a list of strings (or of lists
+    of strings for `authors` and `affiliation`), an `array('i')` of days for
+    `created` and `updated`. The `id` field is stored as the UTF-8 bytes
+    `id_data` and the `array('i')` `id_offsets`, the `categories` field as
+    the flat `array('H')` `category_codes` of `category_table` and the
+    `array('i')` `category_offsets`: the codes of record i are
+    `category_codes[category_offsets[i]:category_offsets[i + 1]]`, and
+    likewise for the id.
+    """
+
+    def __init__(self, fields: Sequence[str] = None, category_table=CATEGORIES):
+        self.fields = tuple(fields or FIELDS)
+        self.category_table = category_table
+        self.columns = {}
+        for field in self.fields:
+            if field in DATE_FIELDS:
+                self.columns[field] = array("i")
+            elif field not in ("id", "categories"):
+                self.columns[field] = []
+        self.id_data = bytearray()
+        self.id_offsets = array("i", [0])
+        self.category_codes = array("H")
+        self.category_offsets = array("i", [0])
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, record):
+        """Append a `Record` (or a record dictionary) to the batch."""
+        for field, column in self.columns.items():
+            value = record[field]
+            if field in DATE_FIELDS:
+                value = to_days(value)
+            column.append(value)
+        if "id" in self.fields:
+            self.id_data += record["id"].encode("utf-8")
+            self.id_offsets.append(len(self.id_data))
+        if "categories" in self.fields:
+            # in the order of the record, the primary category first
+            code = self.category_table.code
+            self.category_codes.extend([code(c) for c in record["categories"].split()])
+            self.category_offsets.append(len(self.category_codes))
+        self._length += 1
+
+    def ids(self) -> List[str]:
+        """Decode the id column into a list of strings."""
+        data = self.id_data
+        offsets = self.id_offsets
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(self))]
+
+    def categories(self) -> List[List[str]]:
+        """Decode the category column into lists of codes, primary first."""
+        codes = self.category_table.codes
+        offsets = self.category_offsets
+        return [
+            [codes[c] for c in self.category_codes[offsets[i]:offsets[i + 1]]]
+            for i in range(len(self))
+        ]
+
+    def category_masks(self) -> List[int]:
+        """
+        Bitmask of the categories of every record over `category_table`, see
+        `categories.CategoryTable`. The batch must have the `categories` field.
+        """
+        if "categories" not in self.fields:
+            raise ValueError("category_masks() requires the 'categories' field")
+        codes = self.category_codes
+        offsets = self.category_offsets
+        masks = []
+        for i in range(len(self)):
+            mask = 0
+            for c in codes[offsets[i]:offsets[i + 1]]:
+                mask |= 1 << c
+            masks.append(mask)
+        return masks
+
+    def to_pydict(self) -> Dict[str, list]:
+        """Columns as plain lists; dates as 'YYYY-MM-DD' strings (or '')."""
+        out = {}
+        for field in self.fields:
+            if field == "id":
+                out[field] = self.ids()
+            elif field == "categories":
+                out[field] = [" ".join(c) for c in self.categories()]
+            elif field in DATE_FIELDS:
+                out[field] = [
+                    "" if d == NULL_DATE else str(datetime.date.fromordinal(d + EPOCH))
+                    for d in self.columns[field]
+                ]
+            else:
+                out[field] = self.columns[field]
+        return out
+
+    def to_pandas(self):
+        """
+        Return a pandas DataFrame built column by column. Dates become
+        datetime64 columns (NaT if missing), categories lists of codes.
+        """
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for field in self.fields:
+            if field == "id":
+                data[field] = self.ids()
+            elif field == "categories":
+                data[field] = self.categories()
+            elif field in DATE_FIELDS:
+                days = np.frombuffer(self.columns[field], dtype=np.int32)
+                dates = days.astype("datetime64[D]")
+                dates[days == NULL_DATE] = np.datetime64("NaT")
+                data[field] = dates
+            else:
+                data[field] = self.columns[field]
+        return pd.DataFrame(data, columns=list(self.fields))
+
+    def to_arrow(self):
+        """
+        Return a pyarrow Table: ids as string (sharing the buffers of the
+        batch), dates as date32, categories as list<dictionary<int32, string>>,
+        authors and affiliation as list<string>.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def view(values, type):
+            # zero-copy view of a typed array
+            return pa.Array.from_buffers(type, len(values), [None, pa.py_buffer(values)])
+
+        arrays = []
+        for field in self.fields:
+            if field == "id":
+                buffers = [None, pa.py_buffer(self.id_offsets), pa.py_buffer(self.id_data)]
+                arrays.append(pa.Array.from_buffers(pa.string(), len(self), buffers))
+            elif field == "categories":
+                values = pa.DictionaryArray.from_arrays(
+                    view(self.category_codes, pa.uint16()).cast(pa.int32()),
+                    pa.array(self.category_table.codes, type=pa.string()),
+                )
+                offsets = view(self.category_offsets, pa.int32())
+                arrays.append(pa.ListArray.from_arrays(offsets, values))
+            elif field in DATE_FIELDS:
+                days = view(self.columns[field], pa.int32())
+                missing = pc.equal(days, NULL_DATE)
+                days = pc.if_else(missing, pa.scalar(None, pa.int32()), days)
+                arrays.append(days.cast(pa.date32()))
+            elif field in LIST_FIELDS:
+                arrays.append(pa.array(self.columns[field], type=pa.list_(pa.string())))
+            else:
+                arrays.append(pa.array(self.columns[field], type=pa.string()))
+        return pa.Table.from_arrays(arrays, names=list(self.fields))
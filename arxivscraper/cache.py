@@ -0,0 +1,175 @@
+"""
+On-disk cache of OAI responses.
+
+Bodies are stored gzip compressed, one file per page. Entries expire
+after a TTL and the least recently used ones are evicted once the cache
+grows beyond its byte budget.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+
+class CachingResponse(object):
+    """
+    File-like wrapper storing a response in the cache while it is read.
+
+    The entry is committed only once the response has been read to the end,
+    so an interrupted download never leaves a truncated page in the cache.
+    """
+
+    def __init__(self, cache, key: str, response):
+        self.cache = cache
+        self.key = key
+        self.response = response
+        self.headers = getattr(response, "headers", None)
+        fd, self._tmp = tempfile.mkstemp(dir=cache.directory, prefix=".tmp-")
+        self._file = gzip.GzipFile(fileobj=os.fdopen(fd, "wb"), mode="wb")
+
+    def read(self, size: int = -1) -> bytes:
+        # read(-1) would make http.client ignore Content-Length on keep-alive
+        data = self.response.read() if size < 0 else self.response.read(size)
+        if self._file is None:
+            return data
+        if data:
+            self._file.write(data)
+        if not data or size < 0:
+            self._commit()
+        return data
+
+    def close(self):
+        if self._file is not None:
+            self._file.fileobj.close()
+            self._file = None
+            os.unlink(self._tmp)
+        if hasattr(self.response, "close"):
+            self.response.close()
+
+    def _commit(self):
+        fileobj = self._file.fileobj
+        self._file.close()
+        fileobj.close()
+        self._file = None
+        self.cache._add(self.key, self._tmp)
+
+    def __del__(self):
+        if getattr(self, "_file", None) is not None:
+            self.close()
+
+
+class ResponseCache(object):
+    """
+    Directory of cached OAI pages.
+
+    Paramters
+    ---------
+    directory: str
+        Where the pages are stored. Created if missing.
+    ttl: float
+        Seconds after which a cached page expires. None keeps pages forever.
+        Default: one day.
+    closed_ttl: float
+        TTL of pages of date windows which have already ended, see
+        `Scraper`. Default: None (forever).
+    max_bytes: int
+        Size budget of the cache. The least recently used pages are evicted
+        when it is exceeded. Default: None (unbounded).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: Optional[float] = 24 * 3600,
+        closed_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.closed_ttl = closed_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Build a cache key from the given parts, e.g. (url, page)."""
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".xml.gz")
+
+    def open(self, key: str, closed: bool = False):
+        """
+        Return a file-like object with the cached page, or None on a miss.
+
+        Pages older than the TTL (`closed_ttl` if `closed`) are removed.
+        """
+        path = self.path(key)
+        ttl = self.closed_ttl if closed else self.ttl
+        try:
+            created = os.stat(path).st_mtime
+            now = time.time()
+            if ttl is not None and now - created > ttl:
+                self._remove(path)
+                return None
+            # the access time tracks recency for the LRU eviction
+            os.utime(path, (now, created))
+            return gzip.open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+    def wrap(self, key: str, response) -> CachingResponse:
+        """Return `response` wrapped so that it is cached while it is read."""
+        return CachingResponse(self, key, response)
+
+    def remove(self, key: str):
+        """Drop the page stored under `key`, if any."""
+        self._remove(self.path(key))
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+        """(path, size, access time) of all cached pages"""
+        for name in os.listdir(self.directory):
+            if name.endswith(".xml.gz"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_atime
+
+    def _add(self, key: str, tmp: str):
+        path = self.path(key)
+        size = os.path.getsize(tmp)
+        with self._lock:
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+            os.replace(tmp, path)
+            now = time.time()
+            os.utime(path, (now, now))
+            self.size += size
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self._evict()
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.size -= size
+
+    def _evict(self):
+        for path, _, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            if self.size <= self.max_bytes:
+                break
+            self._remove(path)
@@ -0,0 +1,172 @@
+"""
+Parsing and matching of arXiv category codes.
+
+The `categories` field of a record is a space separated list of codes
+such as 'cond-mat.soft stat.ml'. Here it is parsed into a frozenset of
+interned, lowercased codes so categories can be selected exactly by set
+membership instead of substring search, or into a bitmask over the
+numbered codes of a `CategoryTable`.
+"""
+import collections
+import functools
+import itertools
+import sys
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable
+
+from .constants import cats, subcats
+
+# lowercased code -> code as written in the taxonomy of constants.py
+KNOWN = {code.lower(): code for code in itertools.chain(cats, *subcats.values())}
+
+
+def is_known(code: str) -> bool:
+    """Tell if `code` is in the taxonomy listed in `constants`."""
+    return code.lower() in KNOWN
+
+
+def archive(code: str) -> str:
+    """Archive of a category code, e.g. 'math.co' -> 'math'."""
+    return code.split(".", 1)[0]
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_categories(text: str) -> FrozenSet[str]:
+    """
+    Parse a categories field into a frozenset of interned lowercased codes.
+
+    Codes missing from the taxonomy (e.g. cs.* or eess.*) are kept as well,
+    `is_known` tells them apart. Identical fields share the same set.
+    """
+    return frozenset(sys.intern(code) for code in text.lower().split())
+
+
+def category_matcher(patterns: Iterable[str]) -> Callable[[FrozenSet[str]], bool]:
+    """
+    Return a function telling if a set of codes matches any of `patterns`.
+
+    A pattern is either an exact code ('stat.ML') or an archive, written
+    'math' or 'math.*', which matches the archive and all its subcategories.
+    """
+    exact = set()
+    archives = set()
+    for pattern in patterns:
+        pattern = pattern.lower()
+        if pattern.endswith(".*"):
+            archives.add(pattern[:-2])
+        elif "." not in pattern:
+            archives.add(pattern)
+        else:
+            exact.add(pattern)
+    exact = frozenset(exact)
+
+    if not archives:
+        return lambda codes: not exact.isdisjoint(codes)
+
+    def match(codes) -> bool:
+        if not exact.isdisjoint(codes):
+            return True
+        for code in codes:
+            if archive(code) in archives:
+                return True
+        return False
+
+    return match
+
+
+class CategoryTable(object):
+    """
+    Table numbering category codes, to encode sets of codes as bitmasks.
+
+    Code i of the table is bit i of a mask, so filters, counts and
+    intersections of categories become integer operations. Codes missing
+    from the table are appended the first time they are seen, so the
+    number of a code never changes.
+    """
+
+    def __init__(self, codes: Iterable[str] = ()):
+        self.codes = []
+        self.index = {}
+        self._masks = {}
+        self._lock = threading.Lock()
+        for code in codes:
+            self.code(code)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def code(self, name: str) -> int:
+        """Number of the code `name`, added to the table if missing."""
+        name = name.lower()
+        try:
+            return self.index[name]
+        except KeyError:
+            with self._lock:
+                if name not in self.index:
+                    self.index[name] = len(self.codes)
+                    self.codes.append(sys.intern(name))
+                return self.index[name]
+
+    def mask(self, codes: Iterable[str]) -> int:
+        """Bitmask of a set of codes, e.g. `Record.category_set`."""
+        if isinstance(codes, frozenset):
+            try:
+                return self._masks[codes]
+            except KeyError:
+                pass
+        mask = 0
+        for code in codes:
+            mask |= 1 << self.code(code)
+        if isinstance(codes, frozenset) and len(self._masks) < 65536:
+            self._masks[codes] = mask
+        return mask
+
+    def mask_for(self, patterns: Iterable[str]) -> int:
+        """
+        Bitmask of the codes matching `patterns` (see `category_matcher`)
+        among the codes currently in the table.
+        """
+        match = category_matcher(patterns)
+        mask = 0
+        for i, code in enumerate(list(self.codes)):
+            if match((code,)):
+                mask |= 1 << i
+        return mask
+
+    def names(self, mask: int) -> FrozenSet[str]:
+        """Codes of the bits set in `mask`."""
+        return frozenset(self.codes[i] for i in _bits(mask))
+
+    def counts(self, masks: Iterable[int]) -> Dict[str, int]:
+        """Number of masks in which each code appears."""
+        counts = collections.Counter()
+        for mask in masks:
+            counts.update(_bits(mask))
+        return {self.codes[i]: n for i, n in sorted(counts.items())}
+
+    def to_words(self, masks: Iterable[int]):
+        """
+        Pack masks into a numpy array of shape (len(masks), words) of
+        uint64, bit i of a mask being bit i % 64 of word i // 64.
+        """
+        import numpy as np
+
+        masks = list(masks)
+        n_words = max(1, (len(self.codes) + 63) // 64)
+        words = np.zeros((len(masks), n_words), dtype=np.uint64)
+        for row, mask in enumerate(masks):
+            for w in range(n_words):
+                words[row, w] = (mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF
+        return words
+
+
+def _bits(mask: int):
+    """Indices of the bits set in `mask`"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# table shared by all records, seeded with the taxonomy of constants.py
+CATEGORIES = CategoryTable(KNOWN)
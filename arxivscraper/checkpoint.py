@@ -0,0 +1,80 @@
+"""
+On-disk checkpoints allowing an interrupted harvest to be resumed.
+"""
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+
+def atomic_write(path: str, data: str):
+    """Write `data` to `path` so that readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Checkpoint(object):
+    """
+    JSON file holding the progress of a harvest.
+
+    The state contains the category and date window of the harvest, the
+    last resumption token, the number of pages fetched and of records
+    already handed to the consumer, and whether the harvest is complete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        """Return the saved state, or None if there is no checkpoint."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, **state):
+        atomic_write(self.path, json.dumps(state, indent=2, sort_keys=True))
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class HarvestState(object):
+    """
+    JSON file holding the high-water mark of incremental harvests: for
+    every set, the last date up to which a harvest was completely written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, str]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, category: str) -> Optional[str]:
+        """High-water mark of `category`, or None before its first harvest."""
+        return self.load().get(category)
+
+    def advance(self, category: str, date: str):
+        """Move the mark of `category` forward to `date` (never backwards)."""
+        marks = self.load()
+        if marks.get(category, "") < date:
+            marks[category] = date
+            atomic_write(self.path, json.dumps(marks, indent=2, sort_keys=True))
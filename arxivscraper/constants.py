@@ -2,6 +2,22 @@ OAI = "{http://www.openarchives.org/OAI/2.0/}"
 ARXIV = "{http://arxiv.org/OAI/arXiv/}"
 BASE = "http://export.arxiv.org/oai2?verb=ListRecords&"
 
+# keys of the dictionary returned by Record.output()
+FIELDS = (
+    "title",
+    "id",
+    "abstract",
+    "categories",
+    "doi",
+    "created",
+    "updated",
+    "authors",
+    "affiliation",
+    "url",
+)
+# fields holding a list of strings
+LIST_FIELDS = ("authors", "affiliation")
+
 
 # catgories
 cats = [
@@ -0,0 +1,126 @@
+"""
+Compile the `filters` dictionary of the Scraper into a single predicate.
+
+Filters are evaluated on anything supporting `record[field]`, i.e. the
+dictionaries returned by `Record.output()` or `Record` objects.
+"""
+import re
+import warnings
+from typing import Callable, Dict, Iterable, List
+
+from .categories import category_matcher, is_known, parse_categories
+from .constants import FIELDS, LIST_FIELDS
+
+# alternative names of the filter keys
+ALIASES = {"author": "authors", "subcats": "categories"}
+# relative cost of checking each field, cheapest first
+COST = {
+    "id": 0,
+    "doi": 0,
+    "created": 0,
+    "updated": 0,
+    "url": 1,
+    "categories": 1,
+    "title": 2,
+    "authors": 3,
+    "affiliation": 3,
+    "abstract": 4,
+}
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regular expression matching any of `words`, with the common
+    prefixes factored out, e.g. ['graph', 'gravity'] -> 'gra(?:ph|vity)'.
+
+    The regex engine then walks the shared prefixes once instead of trying
+    every word at every position of the text.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def pattern(node):
+        optional = "" in node
+        alternatives = [re.escape(char) + pattern(node[char]) for char in sorted(node) if char]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        group = "(?:" + "|".join(alternatives) + ")"
+        return group + "?" if optional else group
+
+    return pattern(trie)
+
+
+def field_value(record, field: str):
+    """
+    Value of `field` as seen by the matchers: the set of category codes for
+    `categories`, the field itself otherwise.
+    """
+    if field == "categories":
+        codes = getattr(record, "category_set", None)
+        return parse_categories(record[field]) if codes is None else codes
+    return record[field]
+
+
+def field_matcher(field: str, words: List[str]) -> Callable:
+    """
+    Return a function telling if `field_value(record, field)` matches any
+    of `words`. Category codes missing from the taxonomy (see
+    `categories.is_known`) only raise a warning, as it is incomplete.
+    """
+    words = [w.lower() for w in words]
+    if field == "categories":
+        unknown = [w for w in words if not is_known(w[:-2] if w.endswith(".*") else w)]
+        if unknown:
+            warnings.warn(
+                "categories %s are not in the taxonomy of arxivscraper.constants, "
+                "check them for typos" % ", ".join(map(repr, unknown)),
+                stacklevel=3,
+            )
+        return category_matcher(words)
+    if field in LIST_FIELDS:
+        # a word matches one element exactly
+        wanted = frozenset(words)
+        return lambda value: not wanted.isdisjoint(value)
+    if "" in words:
+        return lambda value: True
+    search = re.compile(_trie_pattern(words)).search
+    return lambda value: search(value) is not None
+
+
+def compile_filters(filters: Dict[str, List[str]]) -> Callable:
+    """
+    Compile `filters` into a predicate `match(record) -> bool`.
+
+    A record matches if any word of any field is found in that field: a
+    substring for text fields, an exact element for `authors` and
+    `affiliation`, an exact code or an archive ('math', 'math.*') for
+    `categories`. Every field gets a single matcher built once, the
+    cheapest fields are checked first and evaluation stops at the first hit.
+    The fields the predicate reads are listed in `match.fields`.
+    """
+    matchers = []
+    for key, words in filters.items():
+        field = ALIASES.get(key, key)
+        if field not in FIELDS:
+            raise ValueError("unknown filter key %r, expected one of %s" % (key, ", ".join(FIELDS)))
+        if isinstance(words, str):
+            words = [words]
+        if words:
+            matchers.append((COST[field], field, field_matcher(field, words)))
+    matchers.sort(key=lambda m: m[0])
+    checks = [(field, matcher) for _, field, matcher in matchers]
+
+    def match(record) -> bool:
+        for field, matcher in checks:
+            if matcher(field_value(record, field)):
+                return True
+        return False
+
+    match.fields = frozenset(field for field, _ in checks)
+    return match
@@ -0,0 +1,129 @@
+"""
+Parsers for a single OAI-PMH ListRecords response.
+
+Both parsers iterate over the <record> elements of the page and expose
+the resumption token of the page as `token` once iteration is over. An
+OAI-PMH <error> is raised as `OAIError`, except `noRecordsMatch` which is
+an empty last page.
+"""
+import xml.etree.ElementTree as ET
+from typing import Iterator, Optional
+
+from .constants import OAI
+
+LIST_RECORDS = OAI + "ListRecords"
+RECORD = OAI + "record"
+RESUMPTION_TOKEN = OAI + "resumptionToken"
+ERROR = OAI + "error"
+# the error code of an empty result, not a failure
+NO_RECORDS = "noRecordsMatch"
+
+# number of bytes read from the response at a time by StreamPage
+CHUNK_SIZE = 64 * 1024
+
+
+class OAIError(ValueError):
+    """
+    An OAI-PMH error response, e.g. 'badResumptionToken' when a resumption
+    token has expired. The repository answers these with HTTP 200.
+    """
+
+    def __init__(self, code: str, message: str = ""):
+        ValueError.__init__(self, "%s: %s" % (code, message) if message else code)
+        self.code = code
+        self.message = message
+
+
+def check_error(code: Optional[str], message: Optional[str] = None):
+    """Raise OAIError for an <error> element, unless it is noRecordsMatch"""
+    if code != NO_RECORDS:
+        raise OAIError(code or "unknown", (message or "").strip())
+
+
+class TreePage(object):
+    """
+    A page parsed into a full element tree.
+
+    The whole response body is read before the first record is available.
+    """
+
+    def __init__(self, response):
+        root = ET.fromstring(response.read())
+        error = root.find(ERROR)
+        if error is not None:
+            check_error(error.get("code"), error.text)
+        self.records = root.findall(LIST_RECORDS + "/" + RECORD)
+        token = root.find(LIST_RECORDS + "/" + RESUMPTION_TOKEN)
+        self.token: Optional[str] = None if token is None else token.text
+
+    def __iter__(self) -> Iterator[ET.Element]:
+        return iter(self.records)
+
+
+class PageFeed(object):
+    """
+    Incremental parser of a page fed with chunks of bytes as they arrive.
+
+    `feed(chunk)` yields the <record> elements completed by the chunk; each
+    one is cleared and detached from the tree once the consumer moves on.
+    `token` is known after `close()`.
+    """
+
+    def __init__(self):
+        self.token: Optional[str] = None
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._parent = None
+
+    def feed(self, chunk: bytes) -> Iterator[ET.Element]:
+        self._parser.feed(chunk)
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if elem.tag == LIST_RECORDS:
+                    self._parent = elem
+            elif elem.tag == RECORD:
+                yield elem
+                elem.clear()
+                if self._parent is not None:
+                    self._parent.remove(elem)
+            elif elem.tag == RESUMPTION_TOKEN:
+                self.token = elem.text
+            elif elem.tag == ERROR:
+                check_error(elem.get("code"), elem.text)
+
+    def close(self):
+        self._parser.close()
+
+
+class StreamPage(object):
+    """
+    A page parsed incrementally while it is read from the response.
+
+    The response is read in chunks of `chunk_size` bytes and each <record>
+    is yielded as soon as its closing tag has been parsed. Once the consumer
+    moves on, the record is cleared and detached from the tree, so only one
+    record is held in memory at a time. The page can be iterated only once;
+    `token` is known after the iteration is over.
+    """
+
+    def __init__(self, response, chunk_size: int = CHUNK_SIZE):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.token: Optional[str] = None
+        self._records = self._parse()
+
+    def __iter__(self) -> Iterator[ET.Element]:
+        return self._records
+
+    def _parse(self) -> Iterator[ET.Element]:
+        feed = PageFeed()
+        while True:
+            chunk = self.response.read(self.chunk_size)
+            if not chunk:
+                break
+            for record in feed.feed(chunk):
+                yield record
+        feed.close()
+        self.token = feed.token
+
+
+PARSERS = {"tree": TreePage, "stream": StreamPage}
@@ -0,0 +1,157 @@
+"""
+Pipelined harvests overlapping the download of the next page with the
+parsing and filtering of the previous ones.
+
+The resumption token sits at the very end of a ListRecords response, so
+it can be picked out of the raw bytes with a regular expression as soon
+as a page is downloaded. A fetch thread then requests the next page right
+away and hands the body to a pool of worker threads which parse and
+filter it. At most `prefetch` pages wait between the two stages, so wall
+time approaches max(network, CPU) instead of their sum.
+"""
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+from xml.sax.saxutils import unescape
+
+from .parsing import check_error
+
+_STOP = object()
+_TOKEN = re.compile(rb"<(?:\w+:)?resumptionToken\b[^>]*?(?:/>|>([^<]*)<)")
+# the token element, with its attributes, fits in the last bytes of a page
+TAIL = 4096
+_ERROR = re.compile(rb"<(?:\w+:)?error\b([^>]*?)(?:/>|>([^<]*)<)")
+_CODE = re.compile(rb'\bcode\s*=\s*["\']([^"\']*)')
+
+
+def scan_token(body: bytes) -> Optional[str]:
+    """
+    Return the resumption token of a raw ListRecords response without
+    parsing it, or None on the last page. Raise OAIError for an error
+    response, like the parsers.
+    """
+    match = _TOKEN.search(body, max(0, len(body) - TAIL)) or _TOKEN.search(body)
+    if match is None:
+        error = _ERROR.search(body)
+        if error is not None:
+            code = _CODE.search(error.group(1))
+            check_error(
+                code and code.group(1).decode("utf-8"),
+                unescape((error.group(2) or b"").decode("utf-8")),
+            )
+    if match is None or not match.group(1):
+        return None
+    return unescape(match.group(1).decode("utf-8"))
+
+
+class SelectedPage(object):
+    """
+    A page whose records are already selected (filtered) and extracted by
+    a worker thread.
+    """
+
+    selected = True
+
+    def __init__(self, records: List, token: Optional[str]):
+        self.records = records
+        self.token = token
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class Prefetcher(object):
+    """
+    Iterate over the pages of a harvest, fetched and parsed ahead of the
+    consumer. Errors of either stage are raised to the consumer.
+
+    Paramters
+    ---------
+    fetch: callable
+        fetch(url, k) returns the response of the k-th page.
+    parse: callable
+        parse(body) turns the body of a page into a page object with a
+        `token`; it runs on the worker threads.
+    next_url: callable
+        next_url(token) returns the url of the page following `token`.
+    url: str
+        Url of the first page, the k-th of the harvest.
+    prefetch: int
+        Number of fetched pages waiting for the consumer. Default: 2
+    workers: int
+        Number of parsing threads. Default: 2
+    stop: threading.Event
+        Set when the consumer stops early. `fetch` should give up waiting
+        (for a retry or a limiter) once it is set. Default: a new Event
+    """
+
+    def __init__(
+        self,
+        fetch: Callable,
+        parse: Callable,
+        next_url: Callable,
+        url: str,
+        k: int = 1,
+        prefetch: int = 2,
+        workers: int = 2,
+        stop: threading.Event = None,
+    ):
+        self.fetch = fetch
+        self.parse = parse
+        self.next_url = next_url
+        self.url = url
+        self.k = k
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max(1, prefetch))
+        self._stop = threading.Event() if stop is None else stop
+
+    def __iter__(self) -> Iterator:
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        thread = threading.Thread(target=self._run, args=(executor,), name="page-fetcher", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                number, future = item
+                page = future.result()
+                page.number = number
+                yield page
+        finally:
+            # also reached when the consumer stops early; the waits of the
+            # fetch thread end at once, only a request in flight is awaited
+            self._stop.set()
+            thread.join()
+            executor.shutdown(cancel_futures=True)
+
+    def _put(self, item) -> bool:
+        """Queue `item` unless the consumer has gone away"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, executor: ThreadPoolExecutor):
+        url, k = self.url, self.k
+        try:
+            while not self._stop.is_set():
+                body = self.fetch(url, k).read()
+                token = scan_token(body)
+                if not self._put((k, executor.submit(self.parse, body))):
+                    return
+                k += 1
+                if token is None:
+                    break
+                url = self.next_url(token)
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(_STOP)
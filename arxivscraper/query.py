@@ -0,0 +1,186 @@
+"""
+A small boolean query language for selecting records during a harvest.
+
+    categories:stat.ML AND (abstract:"graph neural" OR title:gnn) AND NOT title:survey
+
+A term is `field:word` or `field:"a phrase"`, where field is any of
+`FIELDS` (or an alias such as `author`); a term without a field matches
+the title or the abstract. Terms are combined with AND, OR, NOT and
+parentheses; AND binds tighter than OR and adjacent terms are joined
+with AND. Words are matched like the `filters` of the Scraper, e.g.
+`categories:math.*` selects every subcategory of math.
+
+The query is parsed once into a tree of `Term`, `And`, `Or` and `Not`
+nodes and compiled into a short-circuiting predicate.
+"""
+import re
+from collections import namedtuple
+from typing import Callable, List
+
+from .constants import FIELDS
+from .filters import ALIASES, COST, field_matcher, field_value
+
+# fields searched by a term without a field
+DEFAULT_FIELDS = ("title", "abstract")
+
+Term = namedtuple("Term", ["field", "value"])
+And = namedtuple("And", ["items"])
+Or = namedtuple("Or", ["items"])
+Not = namedtuple("Not", ["item"])
+
+TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<paren>[()])
+      | (?:(?P<field>[A-Za-z_]+):)?(?:"(?P<phrase>[^"]*)"|(?P<word>[^\s()"]+))
+    )""",
+    re.VERBOSE,
+)
+OPERATORS = ("AND", "OR", "NOT")
+
+
+class QuerySyntaxError(ValueError):
+    """Raised for queries which cannot be parsed"""
+
+
+def _tokenize(query: str) -> List:
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        m = TOKEN.match(query, pos)
+        if m is None or m.end() == pos:
+            raise QuerySyntaxError("unexpected %r at position %d" % (query[pos:pos + 10], pos))
+        if m.group("paren"):
+            tokens.append(m.group("paren"))
+        elif m.group("field") is None and m.group("word") in OPERATORS:
+            tokens.append(m.group("word"))
+        else:
+            field = m.group("field")
+            if field is not None:
+                field = ALIASES.get(field.lower(), field.lower())
+                if field not in FIELDS:
+                    raise QuerySyntaxError("unknown field %r at position %d" % (field, m.start("field")))
+            value = m.group("phrase") if m.group("phrase") is not None else m.group("word")
+            if field is None and value.endswith(":"):
+                raise QuerySyntaxError("missing value after %r at position %d" % (value, m.start()))
+            tokens.append(Term(field, value.lower()))
+        pos = m.end()
+    return tokens
+
+
+class _Parser(object):
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QuerySyntaxError("unexpected %r" % (self.peek(),))
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else Or(items)
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.peek() not in (None, "OR", ")"):
+            if self.peek() == "AND":
+                self.take()
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else And(items)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.take()
+        if token == "(":
+            node = self.parse_or()
+            if self.take() != ")":
+                raise QuerySyntaxError("missing closing parenthesis")
+            return node
+        if isinstance(token, Term):
+            return token
+        raise QuerySyntaxError("expected a term, got %r" % (token,))
+
+
+def parse_query(query: str):
+    """Parse `query` into a tree of Term, And, Or and Not nodes."""
+    tokens = _tokenize(query)
+    if not tokens:
+        raise QuerySyntaxError("empty query")
+    return _Parser(tokens).parse()
+
+
+def _cost(node) -> int:
+    if isinstance(node, Term):
+        return max(COST[f] for f in ((node.field,) if node.field else DEFAULT_FIELDS))
+    if isinstance(node, Not):
+        return _cost(node.item)
+    return sum(_cost(item) for item in node.items)
+
+
+def _compile(node) -> Callable:
+    if isinstance(node, Term):
+        fields = (node.field,) if node.field else DEFAULT_FIELDS
+        return _compile_or_terms({f: [node.value] for f in fields})
+    if isinstance(node, Not):
+        inner = _compile(node.item)
+        return lambda record: not inner(record)
+    items = sorted(node.items, key=_cost)
+    if isinstance(node, And):
+        predicates = [_compile(item) for item in items]
+        return lambda record: all(p(record) for p in predicates)
+    # an OR of terms on the same field is checked with a single matcher
+    words = {}
+    predicates = []
+    for item in items:
+        if isinstance(item, Term):
+            for f in (item.field,) if item.field else DEFAULT_FIELDS:
+                words.setdefault(f, []).append(item.value)
+        else:
+            predicates.append(_compile(item))
+    if words:
+        predicates.insert(0, _compile_or_terms(words))
+    return lambda record: any(p(record) for p in predicates)
+
+
+def _compile_or_terms(words) -> Callable:
+    checks = [(f, field_matcher(f, w)) for f, w in sorted(words.items(), key=lambda i: COST[i[0]])]
+    return lambda record: any(match(field_value(record, f)) for f, match in checks)
+
+
+def _fields(node) -> frozenset:
+    if isinstance(node, Term):
+        return frozenset((node.field,) if node.field else DEFAULT_FIELDS)
+    if isinstance(node, Not):
+        return _fields(node.item)
+    return frozenset().union(*(_fields(item) for item in node.items))
+
+
+def compile_query(query: str) -> Callable:
+    """
+    Compile `query` into a predicate `match(record) -> bool`.
+
+    The fields the predicate reads are listed in `match.fields`.
+    """
+    tree = parse_query(query)
+    match = _compile(tree)
+    match.fields = _fields(tree)
+    return match
@@ -0,0 +1,103 @@
+"""
+Politeness limiters that pace the requests sent to the OAI endpoint.
+
+A limiter is any object with a `wait(deadline=None, cancel=None)` method;
+the Scraper calls it before every request. It returns False instead of
+waiting past `deadline` (a `time.monotonic()` value) or once the `cancel`
+event is set. `RateLimiter` paces the threads of one process,
+`FileRateLimiter` every process of a host.
+"""
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows
+    fcntl = None
+
+
+def _sleep(seconds: float, cancel=None) -> bool:
+    """Sleep `seconds`; return False if `cancel` is set in the meantime"""
+    if cancel is None:
+        if seconds > 0:
+            time.sleep(seconds)
+        return True
+    return not cancel.wait(max(seconds, 0))
+
+
+class RateLimiter(object):
+    """
+    Thread-safe limiter spacing requests at least `interval` seconds apart.
+
+    A single instance can be shared by several scrapers (e.g. the shards
+    of a `ShardedScraper`) to bound their combined request rate.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self, deadline: float = None, cancel=None) -> bool:
+        """Block until the next request is allowed, see the module docstring."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            if deadline is not None and start > deadline:
+                return False
+            self._next = start + self.interval
+        return _sleep(start - now, cancel)
+
+
+class FileRateLimiter(object):
+    """
+    Token-bucket limiter whose state lives in a file, shared by every
+    process (and thread) of the host using the same `path`.
+
+    At most `rate` requests are allowed per `per` seconds, with bursts of
+    up to `burst` requests. Each `wait()` takes a token under an exclusive
+    `flock` on the file; callers finding the bucket empty reserve the next
+    token and sleep until it is due, so they are served in order. POSIX only.
+
+    Example:
+    ```
+        # in every harvest process of the host
+        limiter = FileRateLimiter('/tmp/arxiv.bucket', rate=1, per=3)
+        scraper = Scraper(category='math', limiter=limiter)
+    ```
+    """
+
+    _STATE = struct.Struct("dd")
+
+    def __init__(self, path: str, rate: float = 1, per: float = 3.0, burst: float = 1):
+        if fcntl is None:
+            raise OSError("FileRateLimiter needs fcntl, which this platform lacks")
+        self.path = path
+        self.rate = rate
+        self.per = per
+        self.burst = burst
+
+    def wait(self, deadline: float = None, cancel=None) -> bool:
+        """Block until the next request is allowed, see the module docstring."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            data = os.pread(fd, self._STATE.size, 0)
+            if len(data) == self._STATE.size:
+                tokens, last = self._STATE.unpack(data)
+                tokens = min(self.burst, tokens + (now - last) * self.rate / self.per)
+            else:
+                tokens = self.burst
+            # a negative balance is the queue of callers waiting for a token
+            tokens -= 1
+            delay = max(-tokens, 0) * self.per / self.rate
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+        finally:
+            os.close(fd)
+        return _sleep(delay, cancel)
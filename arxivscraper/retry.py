@@ -0,0 +1,147 @@
+"""
+Retry policies deciding whether, and how long after, a failed request
+is sent again.
+
+A policy honours the Retry-After header of 429 and 503 responses and
+otherwise backs off exponentially, with jitter, after network errors and
+5xx responses. Retries are bounded per request and for the whole harvest;
+`retries` and `waited` report what was spent so far.
+
+Example:
+```
+    policy = RetryPolicy(backoff=5, max_delay=300, max_retries=8, budget=50)
+    scraper = Scraper(category='stat', retry=policy)
+```
+"""
+import datetime
+import email.utils
+import http.client
+import random
+import threading
+import time
+from typing import Callable, Optional
+from urllib.error import HTTPError
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def retry_after(value: str, now: float = None) -> Optional[float]:
+    """
+    Seconds to wait according to a Retry-After header, given either as a
+    number of seconds or as an HTTP-date; None if it cannot be parsed.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
+
+class RetryPolicy(object):
+    """
+    Thread-safe retry policy, which can be shared by several scrapers to
+    bound their retries together.
+
+    Paramters
+    ---------
+    backoff: float
+        Delay before the first retry when the server gives no Retry-After;
+        it doubles with every further retry of the same request. Default: 1
+    max_delay: float
+        Cap of the exponential backoff. Default: 300
+    jitter: float
+        Fraction of each backoff delay drawn at random, so that workers
+        failing together do not retry together. Default: 0.5
+    max_retries: int
+        Retries of a single request (page) before giving up. Default: 10
+    budget: int
+        Retries of the whole harvest, i.e. since the last `reset()`, before
+        giving up. Default: None (no limit)
+    statuses: tuple
+        HTTP statuses which are retried. Default: 429 and 5xx gateway errors.
+    """
+
+    def __init__(
+        self,
+        backoff: float = 1.0,
+        max_delay: float = 300.0,
+        jitter: float = 0.5,
+        max_retries: int = 10,
+        budget: int = None,
+        statuses=RETRY_STATUSES,
+    ):
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_retries = max_retries
+        self.budget = budget
+        self.statuses = frozenset(statuses)
+        self.retries = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start counting `retries` and `waited` (and the budget) afresh."""
+        with self._lock:
+            self.retries = 0
+            self.waited = 0.0
+
+    def retryable(self, error: BaseException) -> bool:
+        """Whether `error` is transient: a listed status or a network error."""
+        if isinstance(error, HTTPError):
+            return error.code in self.statuses
+        return isinstance(error, (OSError, http.client.HTTPException))
+
+    def delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a request which failed with `error`
+        after `attempt` retries, or None if it must not be retried. The
+        retry is counted in `retries`.
+        """
+        if not self.retryable(error) or attempt >= self.max_retries:
+            return None
+        seconds = None
+        if isinstance(error, HTTPError) and error.hdrs is not None:
+            seconds = retry_after(error.hdrs.get("Retry-After"))
+        if seconds is None:
+            seconds = min(self.max_delay, self.backoff * 2 ** attempt)
+            seconds *= 1 - self.jitter * random.random()
+        with self._lock:
+            if self.budget is not None and self.retries >= self.budget:
+                return None
+            self.retries += 1
+        return seconds
+
+    def count_wait(self, seconds: float):
+        """Add the `seconds` slept before a retry to `waited`."""
+        with self._lock:
+            self.waited += seconds
+
+    def call(self, func: Callable, *args, sleep: Callable = time.sleep):
+        """Return `func(*args)`, retrying it while the policy allows."""
+        attempt = 0
+        while True:
+            try:
+                return func(*args)
+            except Exception as e:
+                seconds = self.delay(e, attempt)
+                if seconds is None:
+                    raise
+                print("Got {0}. Retrying after {1:.1f} seconds.".format(_describe(e), seconds))
+                sleep(seconds)
+                self.count_wait(seconds)
+                attempt += 1
+
+
+def _describe(error: BaseException) -> str:
+    if isinstance(error, HTTPError):
+        return str(error.code)
+    return type(error).__name__
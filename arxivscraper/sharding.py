@@ -0,0 +1,170 @@
+"""
+Harvest a long date range as several independent date windows.
+
+Each window gets its own OAI ListRecords chain; windows are fetched by
+a bounded pool of threads sharing one politeness limiter.
+"""
+import calendar
+import datetime
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from .arxivscraper import Scraper
+from .ratelimit import RateLimiter
+
+FREQUENCIES = ("day", "week", "month", "year")
+
+
+def _parse_date(date: str) -> datetime.date:
+    return datetime.datetime.strptime(date, "%Y-%m-%d").date()
+
+
+def _window_end(start: datetime.date, freq: str) -> datetime.date:
+    if freq == "day":
+        return start
+    if freq == "week":
+        return start + datetime.timedelta(days=6)
+    if freq == "month":
+        last = calendar.monthrange(start.year, start.month)[1]
+        return start.replace(day=last)
+    return start.replace(month=12, day=31)
+
+
+def date_windows(date_from: str, date_until: str, freq: str = "month") -> List[Tuple[str, str]]:
+    """
+    Split the inclusive range `date_from`..`date_until` into consecutive,
+    non-overlapping (from, until) windows aligned on calendar days, weeks
+    (starting at `date_from`), months or years.
+
+    >>> date_windows('2017-01-15', '2017-03-02')
+    [('2017-01-15', '2017-01-31'), ('2017-02-01', '2017-02-28'), ('2017-03-01', '2017-03-02')]
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError("freq must be one of %s, got %r" % (", ".join(FREQUENCIES), freq))
+    start, end = _parse_date(date_from), _parse_date(date_until)
+    windows = []
+    while start <= end:
+        stop = min(_window_end(start, freq), end)
+        windows.append((str(start), str(stop)))
+        start = stop + datetime.timedelta(days=1)
+    return windows
+
+
+class ShardedScraper(object):
+    """
+    Scrape a date range window by window with a pool of threads.
+
+    Paramters
+    ---------
+    category: str
+        The category of scraped records
+    date_from: str
+        starting date in format 'YYYY-MM-DD'.
+    date_until: str
+        final date in format 'YYYY-MM-DD'. Default: today.
+    freq: str
+        Size of the windows: 'day', 'week', 'month' (default) or 'year'.
+    workers: int
+        Number of windows harvested concurrently. Default: 4
+    interval: float
+        Minimum number of seconds between two requests of all workers
+        together. Default: 3s. Ignored if `limiter` is given.
+    limiter: object
+        Politeness limiter shared by all windows, see `arxivscraper.ratelimit`.
+    **kwargs:
+        Any other argument of `Scraper` (filters, parser, transport, ...),
+        except `checkpoint`, `resume` and `state`: the windows would share
+        one checkpoint, and they complete out of order.
+
+    Records are yielded window after window, i.e. in datestamp order of the
+    windows, and records already seen in a previous window are skipped.
+    If a window is cut short by its `timeout` or by `cancel`, its records
+    are the last ones yielded: `stopped` tells why, `stopped_window` which
+    window and `resumption_token` where its harvest stopped. All three are
+    None after a complete harvest.
+
+    Example:
+    ```
+        from arxivscraper.sharding import ShardedScraper
+        scraper = ShardedScraper(category='physics:cond-mat', date_from='2010-01-01',
+                                 date_until='2010-12-31', workers=4)
+        output = scraper.scrape()
+    ```
+    """
+
+    def __init__(
+        self,
+        category: str,
+        date_from: str,
+        date_until: str = None,
+        freq: str = "month",
+        workers: int = 4,
+        interval: float = 3.0,
+        limiter=None,
+        **kwargs
+    ):
+        unsupported = sorted(set(kwargs).intersection(("checkpoint", "resume", "state")))
+        if unsupported:
+            raise ValueError("ShardedScraper does not support %s" % ", ".join(unsupported))
+        if date_until is None:
+            date_until = str(datetime.date.today())
+        self.windows = date_windows(date_from, date_until, freq)
+        self.stopped = None
+        self.stopped_window = None
+        self.resumption_token = None
+        self.workers = workers
+        self.limiter = RateLimiter(interval) if limiter is None else limiter
+        self.scrapers = [
+            Scraper(category, date_from=f, date_until=u, limiter=self.limiter, **kwargs)
+            for f, u in self.windows
+        ]
+
+    def iter_windows(self) -> Iterator[List[Dict]]:
+        """
+        Yield the records of every window, in window order, up to the
+        first window which is not complete.
+
+        At most `2 * workers` windows are buffered at a time.
+        """
+        self.stopped = None
+        self.stopped_window = None
+        self.resumption_token = None
+        windows = iter(zip(self.windows, self.scrapers))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = [
+                (window, scraper, pool.submit(self._harvest, scraper))
+                for window, scraper in itertools.islice(windows, 2 * self.workers)
+            ]
+            try:
+                while pending:
+                    window, scraper, future = pending.pop(0)
+                    records = future.result()
+                    if scraper.stopped is not None:
+                        self.stopped = scraper.stopped
+                        self.stopped_window = window
+                        self.resumption_token = scraper.resumption_token
+                        yield records
+                        return
+                    for window, scraper in itertools.islice(windows, 1):
+                        pending.append((window, scraper, pool.submit(self._harvest, scraper)))
+                    yield records
+            finally:
+                for _, scraper, future in pending:
+                    future.cancel()
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield the deduplicated records of all windows one by one."""
+        seen = set()
+        for records in self.iter_windows():
+            for record in records:
+                if record["id"] not in seen:
+                    seen.add(record["id"])
+                    yield record
+
+    def scrape(self) -> List[Dict]:
+        return list(self.iter_records())
+
+    @staticmethod
+    def _harvest(scraper: Scraper) -> List[Dict]:
+        return list(scraper.iter_records())
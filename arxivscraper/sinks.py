@@ -0,0 +1,288 @@
+"""
+Sinks writing the records of a harvest to disk page by page.
+
+Pages handed to a sink are put on a bounded queue and written by a
+background thread, so disk I/O overlaps the fetching of the next page.
+After each page the file is flushed and the optional `then` callback
+runs (the Scraper uses it to save its checkpoint), so a checkpoint never
+counts records which are not on disk yet.
+
+Example:
+```
+    with JSONLSink('cond-mat.jsonl.gz') as sink:
+        stats = scraper.scrape(sink=sink)
+```
+"""
+import collections
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+from typing import Callable, Dict, List, Sequence
+
+from .batch import EPOCH, NULL_DATE
+from .categories import archive
+from .constants import FIELDS, LIST_FIELDS
+
+_STOP = object()
+
+
+class Sink(object):
+    """
+    Base class of the sinks.
+
+    Subclasses implement `_open()`, `_write_page(records)`, `_flush()` and
+    `_close()`, which all run on the writer thread. A sink whose `columnar`
+    attribute is True receives `RecordBatch` objects instead of lists of
+    record dictionaries.
+
+    Paramters
+    ---------
+    queue_size: int
+        Number of pages waiting to be written before `write` blocks. Default: 4
+    """
+
+    columnar = False
+
+    def __init__(self, queue_size: int = 4):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._error = None
+        self._broken = None
+        self.pages = 0
+        self.records = 0
+
+    def write(self, page, then: Callable = None):
+        """Queue a page for writing; `then()` is called once it is flushed."""
+        self._check()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sink-writer", daemon=True)
+            self._thread.start()
+        self._queue.put((page, then))
+
+    def flush(self):
+        """Wait until every queued page is written and flushed."""
+        if self._thread is not None:
+            self._queue.join()
+        self._check()
+
+    def close(self):
+        """Flush the remaining pages, stop the writer and close the file."""
+        if self._thread is not None:
+            self._queue.put((_STOP, None))
+            self._thread.join()
+            self._thread = None
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self._broken is not None:
+            raise self._broken
+
+    def _run(self):
+        try:
+            self._open()
+        except Exception as e:
+            # nothing can be written: every later call raises, while the
+            # queue keeps being drained so the producer never blocks
+            self._broken = e
+        try:
+            while True:
+                page, then = self._queue.get()
+                try:
+                    if page is _STOP:
+                        break
+                    if self._error is None and self._broken is None:
+                        self._write_page(page)
+                        self._flush()
+                        self.pages += 1
+                        self.records += len(page)
+                        if then is not None:
+                            then()
+                except Exception as e:
+                    # reported to the producer on its next call
+                    self._error = e
+                finally:
+                    self._queue.task_done()
+        finally:
+            if self._broken is None:
+                self._close()
+
+    def _open(self):
+        pass
+
+    def _write_page(self, page):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+class FileSink(Sink):
+    """
+    A sink writing text to a single file, gzip compressed if `compress`
+    is True or the path ends with '.gz'. With `append` new records are
+    added to an existing file, e.g. when a harvest is resumed.
+    """
+
+    def __init__(self, path: str, compress: bool = None, append: bool = False, queue_size: int = 4):
+        Sink.__init__(self, queue_size)
+        self.path = path
+        self.compress = path.endswith(".gz") if compress is None else compress
+        self.append = append
+        self._file = None
+
+    def _open(self):
+        mode = "at" if self.append else "wt"
+        if self.compress:
+            self._file = gzip.open(self.path, mode, encoding="utf-8", newline="")
+        else:
+            self._file = io.open(self.path, mode, encoding="utf-8", newline="")
+
+    def _flush(self):
+        self._file.flush()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class JSONLSink(FileSink):
+    """Write one JSON object per line."""
+
+    def _write_page(self, records: List[Dict]):
+        self._file.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+class CSVSink(FileSink):
+    """
+    Write records as CSV rows with a header, list fields joined by '; '.
+
+    Paramters
+    ---------
+    fields: list
+        Columns of the file. Default: `FIELDS`
+    """
+
+    def __init__(self, path: str, fields: Sequence[str] = FIELDS, **kwargs):
+        FileSink.__init__(self, path, **kwargs)
+        self.fields = tuple(fields)
+        self._writer = None
+
+    def _open(self):
+        FileSink._open(self)
+        self._writer = csv.writer(self._file)
+        if not self.append or self._file.tell() == 0:
+            self._writer.writerow(self.fields)
+
+    def _write_page(self, records: List[Dict]):
+        # the strings of list fields are joined in one cell
+        self._writer.writerows(
+            ["; ".join(record[f]) if f in LIST_FIELDS else record[f] for f in self.fields]
+            for record in records
+        )
+
+
+class ParquetSink(Sink):
+    """
+    Write a Parquet dataset partitioned by month of creation and archive of
+    the primary category, e.g. `root/month=2017-05/archive=cond-mat/part-0.parquet`.
+
+    The sink receives one `RecordBatch` per OAI page and writes it as one
+    row group per partition: categories are dictionary encoded, dates
+    stored as date32 and authors as list<string>. Requires pyarrow
+    (`pip install arxivscraper[parquet]`); the batches must include the
+    `created` and `categories` fields.
+
+    Paramters
+    ---------
+    root: str
+        Directory of the dataset.
+    max_open_files: int
+        Number of partition files kept open at once. The least recently
+        used one is closed when a new partition is opened; writing to it
+        again starts a new part file. Default: 32
+    compression: str
+        Parquet compression codec. Default: 'snappy'
+    """
+
+    columnar = True
+
+    def __init__(self, root: str, max_open_files: int = 32, compression: str = "snappy", queue_size: int = 4):
+        Sink.__init__(self, queue_size)
+        self.root = root
+        self.max_open_files = max_open_files
+        self.compression = compression
+        self._writers = collections.OrderedDict()
+        self._parts = collections.Counter()
+
+    def _open(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def _write_page(self, batch):
+        import pyarrow as pa
+
+        table = batch.to_arrow()
+        partitions = collections.defaultdict(list)
+        for row, key in enumerate(self._partition_keys(batch)):
+            partitions[key].append(row)
+        for key, rows in partitions.items():
+            part = table.take(pa.array(rows, type=pa.int32()))
+            self._writer(key, table.schema).write_table(part, row_group_size=len(rows))
+
+    def _partition_keys(self, batch):
+        """(month, archive) of every record of the batch"""
+        codes = batch.category_table.codes
+        offsets = batch.category_offsets
+        for i, days in enumerate(batch.columns["created"]):
+            if days == NULL_DATE:
+                month = "unknown"
+            else:
+                month = str(datetime.date.fromordinal(days + EPOCH))[:7]
+            if offsets[i] < offsets[i + 1]:
+                category = archive(codes[batch.category_codes[offsets[i]]])
+            else:
+                category = "unknown"
+            yield month, category
+
+    def _writer(self, key, schema):
+        import pyarrow.parquet as pq
+
+        if key in self._writers:
+            self._writers.move_to_end(key)
+            return self._writers[key]
+        if len(self._writers) >= self.max_open_files:
+            _, writer = self._writers.popitem(last=False)
+            writer.close()
+        month, category = key
+        directory = os.path.join(self.root, "month=%s" % month, "archive=%s" % category)
+        os.makedirs(directory, exist_ok=True)
+        # never overwrite the parts of previous runs
+        while True:
+            path = os.path.join(directory, "part-%d.parquet" % self._parts[key])
+            self._parts[key] += 1
+            if not os.path.exists(path):
+                break
+        writer = pq.ParquetWriter(path, schema, compression=self.compression)
+        self._writers[key] = writer
+        return writer
+
+    def _close(self):
+        while self._writers:
+            _, writer = self._writers.popitem(last=False)
+            writer.close()
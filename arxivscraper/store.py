@@ -0,0 +1,228 @@
+"""
+A local corpus of records in SQLite.
+
+`ArxivStore` keeps one row per arXiv id: records harvested again replace
+the stored version only if they are at least as recent. Authors,
+affiliations and categories are kept in indexed side tables and an FTS5
+index covers titles and abstracts.
+
+Example:
+```
+    store = ArxivStore('arxiv.db')
+    with store:
+        scraper.scrape(sink=store)
+    store.search_all('abstract', 'graph', 'neural')
+```
+"""
+import sqlite3
+from typing import Dict, Iterable, List
+
+from .sinks import Sink
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT,
+    abstract TEXT,
+    categories TEXT,
+    doi TEXT,
+    created TEXT,
+    updated TEXT,
+    url TEXT
+);
+CREATE TABLE IF NOT EXISTS authors (
+    paper INTEGER NOT NULL REFERENCES papers(rowid) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (paper, position)
+);
+CREATE INDEX IF NOT EXISTS authors_name ON authors(name);
+CREATE TABLE IF NOT EXISTS affiliations (
+    paper INTEGER NOT NULL REFERENCES papers(rowid) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (paper, position)
+);
+CREATE INDEX IF NOT EXISTS affiliations_name ON affiliations(name);
+CREATE TABLE IF NOT EXISTS categories (
+    paper INTEGER NOT NULL REFERENCES papers(rowid) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    PRIMARY KEY (paper, code)
+);
+CREATE INDEX IF NOT EXISTS categories_code ON categories(code);
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, abstract, content='papers', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract)
+    VALUES ('delete', old.rowid, old.title, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract)
+    VALUES ('delete', old.rowid, old.title, old.abstract);
+    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+END;
+"""
+
+# a record replaces the stored one only if it is at least as recent
+UPSERT = """
+INSERT INTO papers (id, title, abstract, categories, doi, created, updated, url)
+VALUES (:id, :title, :abstract, :categories, :doi, :created, :updated, :url)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title,
+    abstract = excluded.abstract,
+    categories = excluded.categories,
+    doi = excluded.doi,
+    created = excluded.created,
+    updated = excluded.updated,
+    url = excluded.url
+WHERE COALESCE(NULLIF(excluded.updated, ''), excluded.created)
+   >= COALESCE(NULLIF(papers.updated, ''), papers.created)
+RETURNING rowid
+"""
+
+COLUMNS = ("id", "title", "abstract", "categories", "doi", "created", "updated", "url")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the database at `path` in WAL mode and create the schema."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def upsert(conn: sqlite3.Connection, records: Iterable[Dict]) -> int:
+    """
+    Insert or update `records` in one transaction and return the number of
+    records written (older versions of stored records are skipped).
+    """
+    written = 0
+    with conn:
+        for record in records:
+            row = conn.execute(UPSERT, {c: record.get(c, "") for c in COLUMNS}).fetchone()
+            if row is None:
+                continue
+            written += 1
+            paper = row[0]
+            for table in ("authors", "affiliations", "categories"):
+                conn.execute("DELETE FROM %s WHERE paper = ?" % table, (paper,))
+            conn.executemany(
+                "INSERT INTO authors (paper, position, name) VALUES (?, ?, ?)",
+                [(paper, i, name) for i, name in enumerate(record.get("authors", []))],
+            )
+            conn.executemany(
+                "INSERT INTO affiliations (paper, position, name) VALUES (?, ?, ?)",
+                [(paper, i, name) for i, name in enumerate(record.get("affiliation", []))],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO categories (paper, code) VALUES (?, ?)",
+                [(paper, code) for code in record.get("categories", "").split()],
+            )
+    return written
+
+
+class ArxivStore(Sink):
+    """
+    SQLite store of records, upserted by arXiv id.
+
+    The store is also a sink: `scraper.scrape(sink=store)` writes every page
+    in one transaction from the writer thread, on its own connection, while
+    the store can be queried from the calling thread. SQLite must be built
+    with FTS5 and be version 3.35 or newer.
+
+    Paramters
+    ---------
+    path: str
+        Path of the database file.
+    """
+
+    def __init__(self, path: str, queue_size: int = 4):
+        Sink.__init__(self, queue_size)
+        self.path = path
+        self.conn = connect(path)
+        self._writer_conn = None
+
+    def upsert(self, records: Iterable[Dict]) -> int:
+        """Insert or update `records` now; return the number written."""
+        return upsert(self.conn, records)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def get(self, id: str) -> Dict:
+        """Return the record with arXiv id `id`, or None."""
+        rows = self._records("SELECT rowid, * FROM papers WHERE id = ?", (id,))
+        return rows[0] if rows else None
+
+    def by_author(self, name: str) -> List[Dict]:
+        """Records of an author, by name as in `Record.authors`, e.g. 'jane doe'."""
+        return self._records(
+            "SELECT rowid, * FROM papers WHERE rowid IN "
+            "(SELECT paper FROM authors WHERE name = ?) ORDER BY id",
+            (name.lower(),),
+        )
+
+    def by_category(self, code: str) -> List[Dict]:
+        """Records listed in the category `code`, e.g. 'stat.ml'."""
+        return self._records(
+            "SELECT rowid, * FROM papers WHERE rowid IN "
+            "(SELECT paper FROM categories WHERE code = ?) ORDER BY id",
+            (code.lower(),),
+        )
+
+    def search(self, query: str, limit: int = None) -> List[Dict]:
+        """Records matching an FTS5 `query`, best matches first."""
+        sql = (
+            "SELECT papers.rowid, papers.* FROM papers_fts "
+            "JOIN papers ON papers.rowid = papers_fts.rowid "
+            "WHERE papers_fts MATCH ? ORDER BY rank"
+        )
+        if limit is not None:
+            sql += " LIMIT %d" % int(limit)
+        return self._records(sql, (query,))
+
+    def search_all(self, col: str, *words) -> List[Dict]:
+        """Records whose `col` ('title' or 'abstract') contains all the words."""
+        if col not in ("title", "abstract"):
+            raise ValueError("col must be 'title' or 'abstract', got %r" % col)
+        terms = " AND ".join('"%s"' % word.replace('"', '""') for word in words)
+        return self.search("%s: (%s)" % (col, terms))
+
+    def close(self):
+        Sink.close(self)
+        self.conn.close()
+
+    def _records(self, sql: str, params=()) -> List[Dict]:
+        rows = self.conn.execute(sql, params).fetchall()
+        records = []
+        for row in rows:
+            record = {c: row[c] for c in COLUMNS}
+            record["authors"] = [
+                r[0] for r in self.conn.execute(
+                    "SELECT name FROM authors WHERE paper = ? ORDER BY position", (row["rowid"],)
+                )
+            ]
+            record["affiliation"] = [
+                r[0] for r in self.conn.execute(
+                    "SELECT name FROM affiliations WHERE paper = ? ORDER BY position", (row["rowid"],)
+                )
+            ]
+            records.append(record)
+        return records
+
+    def _open(self):
+        self._writer_conn = connect(self.path)
+
+    def _write_page(self, records: List[Dict]):
+        upsert(self._writer_conn, records)
+
+    def _close(self):
+        self._writer_conn.close()
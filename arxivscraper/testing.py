@@ -0,0 +1,224 @@
+"""
+A local stand-in for the arXiv OAI-PMH endpoint.
+
+`FakeOAIServer` serves deterministic synthetic records in the arXiv
+metadata format, split in pages chained by resumption tokens, so the
+scraper can be tested and benchmarked without network access.
+
+Example:
+```
+    from arxivscraper.testing import FakeOAIServer
+    with FakeOAIServer(n_records=2500) as server:
+        scraper = arxivscraper.Scraper(category='physics:cond-mat', base_url=server.url)
+        output = scraper.scrape()
+```
+"""
+import datetime
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+from .constants import subcats
+
+WORDS = (
+    "quantum lattice spin network learning graph neural entropy phase transition "
+    "topological field theory dark matter galaxy random matrix stochastic "
+    "inference bayesian optimal transport manifold cohomology superconducting "
+    "magnetic disorder glass polymer fluid turbulence sparse estimator kernel"
+).split()
+FORENAMES = ["Jane", "John", "Maria", "Wei", "Olga", "Ahmed", "Yuki", "Pablo"]
+KEYNAMES = ["Doe", "Smith", "Garcia", "Zhang", "Ivanova", "Hassan", "Sato", "Costa"]
+AFFILIATIONS = ["MIT", "CERN", "Max Planck Institute", "University of Tokyo", "ETH Zurich"]
+CATEGORIES = [code for codes in subcats.values() for code in codes]
+
+RECORD = """<record><header><identifier>oai:arXiv.org:{id}</identifier><datestamp>{datestamp}</datestamp>\
+<setSpec>physics:cond-mat</setSpec></header><metadata><arXiv xmlns="http://arxiv.org/OAI/arXiv/" \
+xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"><id>{id}</id><created>{created}</created>{updated}\
+<authors>{authors}</authors><title>{title}</title><categories>{categories}</categories>{doi}\
+<abstract>  {abstract}
+</abstract></arXiv></metadata></record>"""
+AUTHOR = "<author><keyname>{keyname}</keyname><forenames>{forenames}</forenames>{affiliation}</author>"
+PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\
+<responseDate>2017-06-01T00:00:00Z</responseDate><request verb="ListRecords">http://export.arxiv.org/oai2</request>\
+<ListRecords>{records}{token}</ListRecords></OAI-PMH>"""
+TOKEN = '<resumptionToken cursor="{cursor}" completeListSize="{size}">{token}</resumptionToken>'
+ERROR = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">\
+<responseDate>2017-06-01T00:00:00Z</responseDate><request>http://export.arxiv.org/oai2</request>\
+<error code="{code}">{message}</error></OAI-PMH>"""
+
+
+def _words(i: int, n: int) -> str:
+    return " ".join(WORDS[(i * 7 + j * 13) % len(WORDS)] for j in range(n))
+
+
+def render_record(i: int) -> str:
+    """Return the <record> element of the i-th synthetic record."""
+    created = datetime.date(2017, 1, 1) + datetime.timedelta(days=i % 365)
+    authors = "".join(
+        AUTHOR.format(
+            keyname=KEYNAMES[(i + j) % len(KEYNAMES)],
+            forenames=FORENAMES[(i * 3 + j) % len(FORENAMES)],
+            affiliation="<affiliation>%s</affiliation>" % escape(AFFILIATIONS[(i + j) % len(AFFILIATIONS)])
+            if (i + j) % 3 == 0
+            else "",
+        )
+        for j in range(1 + i % 6)
+    )
+    categories = " ".join(CATEGORIES[(i * 5 + j * 11) % len(CATEGORIES)] for j in range(1 + i % 3))
+    return RECORD.format(
+        id="%02d%02d.%05d" % (created.year % 100, created.month, i),
+        datestamp=created,
+        created=created,
+        updated="<updated>%s</updated>" % (created + datetime.timedelta(days=30)) if i % 4 == 0 else "",
+        authors=authors,
+        title=_words(i, 8),
+        categories=categories,
+        doi="<doi>10.1000/fake.%d</doi>" % i if i % 2 == 0 else "",
+        abstract=_words(i + 1, 120),
+    )
+
+
+def render_page(cursor: int, n_records: int, page_size: int = 1000) -> bytes:
+    """Return the ListRecords page starting at record `cursor` of a list of `n_records`."""
+    stop = min(cursor + page_size, n_records)
+    records = "".join(render_record(i) for i in range(cursor, stop))
+    token = "fake|%d" % stop if stop < n_records else ""
+    return PAGE.format(
+        records=records, token=TOKEN.format(cursor=cursor, size=n_records, token=token)
+    ).encode("utf-8")
+
+
+def render_error(code: str, message: str = "") -> bytes:
+    """Return an OAI-PMH error response, e.g. for code 'badResumptionToken'."""
+    return ERROR.format(code=code, message=escape(message)).encode("utf-8")
+
+
+class FakeOAIServer(object):
+    """
+    Threaded HTTP server answering ListRecords requests with synthetic records.
+
+    Paramters
+    ---------
+    n_records: int
+        Size of the complete list. Default: 2500
+    page_size: int
+        Number of records per page. Default: 1000, as on arXiv.
+    fail_every: int
+        Answer every `fail_every`-th request with 503 and a Retry-After header.
+        Default: 0 (never).
+    retry_after: int
+        Value of the Retry-After header of the 503 responses.
+    delay: float
+        Seconds to wait before answering each request, to mimic a slow server.
+    cache_pages: int
+        Number of rendered pages kept in memory. Default: 16
+
+    The records are the same for every request and every set or date range.
+    An unknown resumption token is answered, like on arXiv, with HTTP 200
+    and a 'badResumptionToken' error. `requests` counts the requests
+    received so far.
+    """
+
+    def __init__(
+        self,
+        n_records: int = 2500,
+        page_size: int = 1000,
+        fail_every: int = 0,
+        retry_after: int = 1,
+        delay: float = 0.0,
+        cache_pages: int = 16,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.n_records = n_records
+        self.page_size = page_size
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.delay = delay
+        self.cache_pages = cache_pages
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base url to pass as `Scraper(base_url=...)`"""
+        host, port = self._httpd.server_address[:2]
+        return "http://%s:%d/oai2?verb=ListRecords&" % (host, port)
+
+    def start(self) -> "FakeOAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOAIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def page(self, cursor: int, compress: bool = False) -> bytes:
+        """Return the body of the page starting at record `cursor`."""
+        if (cursor, compress) not in self._pages:
+            body = render_page(cursor, self.n_records, self.page_size)
+            if len(self._pages) >= self.cache_pages:
+                self._pages.clear()
+            self._pages[cursor, compress] = gzip.compress(body, 1) if compress else body
+        return self._pages[cursor, compress]
+
+    def pages(self) -> List[bytes]:
+        """Return the bodies of all pages of the complete list."""
+        return [self.page(cursor) for cursor in range(0, self.n_records, self.page_size)]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    n = server.requests
+                if server.delay:
+                    time.sleep(server.delay)
+                if server.fail_every and n % server.fail_every == 0:
+                    self.send_response(503)
+                    self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                query = parse_qs(urlsplit(self.path).query)
+                token = query.get("resumptionToken", ["fake|0"])[0]
+                compress = "gzip" in self.headers.get("Accept-Encoding", "")
+                try:
+                    body = server.page(int(token.split("|")[1]), compress)
+                except (IndexError, ValueError):
+                    body = render_error("badResumptionToken", "invalid or expired resumptionToken")
+                    compress = False
+                self.send_response(200)
+                self.send_header("Content-Type", "text/xml; charset=utf-8")
+                if compress:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,268 @@
+"""
+HTTP transports used by the Scraper to fetch OAI pages.
+
+A transport is any object with an `open(url)` method returning a
+file-like response (with `read(size)` and `headers`) and raising
+`urllib.error.HTTPError` for HTTP error statuses. Transports whose
+`accepts_deadline` attribute is True take a `deadline` keyword too (a
+`time.monotonic()` value) and never let a socket operation outlast it.
+"""
+import http.client
+import io
+import socket
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass, urlopen
+
+# exceptions raised when a kept-alive connection was closed by the server
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+def clamp(timeout: Optional[float], deadline: Optional[float]) -> Optional[float]:
+    """
+    `timeout` shortened to the seconds left until the monotonic `deadline`;
+    raise socket.timeout if the deadline has passed.
+    """
+    if deadline is None:
+        return timeout
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise socket.timeout("deadline passed")
+    return left if timeout is None else min(timeout, left)
+
+
+def default_transport(
+    url: str, connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None
+):
+    """
+    Transport for requests to `url`: an `HTTPTransport`, or a proxy aware
+    `UrllibTransport` if the environment sets a proxy for `url` (e.g.
+    `https_proxy`, unless `no_proxy` excludes the host).
+    """
+    parts = urlsplit(url)
+    if parts.scheme in getproxies() and not proxy_bypass(parts.hostname or ""):
+        return UrllibTransport(timeout=read_timeout)
+    return HTTPTransport(connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+
+class UrllibTransport(object):
+    """
+    Open every request with a fresh `urlopen` call (proxy aware, no reuse),
+    with a socket `timeout` in seconds if given.
+    """
+
+    accepts_deadline = True
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+
+    def open(self, url: str, deadline: Optional[float] = None):
+        timeout = clamp(self.timeout, deadline)
+        if timeout is None:
+            return urlopen(url)
+        return urlopen(url, timeout=timeout)
+
+    def close(self):
+        pass
+
+
+class GzipResponse(object):
+    """File-like wrapper decompressing a gzip encoded response on the fly."""
+
+    def __init__(self, raw: http.client.HTTPResponse, chunk_size: int = 64 * 1024):
+        self.raw = raw
+        self.headers = raw.headers
+        self.status = raw.status
+        self.chunk_size = chunk_size
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = self.raw.read(self.chunk_size)
+            if not chunk:
+                self._buffer += self._decompressor.flush()
+                break
+            self._buffer += self._decompressor.decompress(chunk)
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self.raw.close()
+
+
+class DeadlineResponse(object):
+    """
+    File-like wrapper shortening the socket timeout before every read, so
+    that the body download ends by the `deadline` at the latest.
+    """
+
+    def __init__(self, response, sock, read_timeout, deadline: float, chunk_size: int = 64 * 1024):
+        self.response = response
+        self.headers = response.headers
+        self.status = response.status
+        self.sock = sock
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.chunk_size = chunk_size
+
+    def read(self, size: int = -1) -> bytes:
+        if size >= 0:
+            self._arm()
+            return self.response.read(size)
+        chunks = []
+        while True:
+            self._arm()
+            chunk = self.response.read(self.chunk_size)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def close(self):
+        self.response.close()
+
+    def _arm(self):
+        timeout = clamp(self.read_timeout, self.deadline)
+        try:
+            self.sock.settimeout(timeout)
+        except OSError:
+            # closed once the response was read to the end
+            pass
+
+
+class HTTPTransport(object):
+    """
+    Keep-alive transport built on `http.client`.
+
+    One persistent connection is kept per host (and per thread), so
+    subsequent pages of a harvest skip the TCP/TLS handshakes. Responses
+    are requested with `Accept-Encoding: gzip` and decompressed as they
+    are read.
+
+    Parameters
+    ----------
+    timeout: float
+        Socket timeout in seconds, for both connecting and reading.
+        Default: no timeout.
+    connect_timeout: float
+        Timeout in seconds of opening a connection. Default: `timeout`
+    read_timeout: float
+        Timeout in seconds of every read from the socket, e.g. while the
+        server prepares a page. Default: `timeout`
+    compress: bool
+        Ask the server for gzip compressed responses. Default: True.
+    headers: dict
+        Extra headers sent with every request.
+    max_redirects: int
+        Maximum number of redirects followed for a single request.
+    """
+
+    accepts_deadline = True
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        compress: bool = True,
+        headers: Optional[Dict[str, str]] = None,
+        max_redirects: int = 5,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ):
+        self.timeout = timeout
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self.read_timeout = timeout if read_timeout is None else read_timeout
+        self.compress = compress
+        self.headers = {"User-Agent": "arxivscraper", "Connection": "keep-alive"}
+        if compress:
+            self.headers["Accept-Encoding"] = "gzip"
+        self.headers.update(headers or {})
+        self.max_redirects = max_redirects
+        self._local = threading.local()
+
+    def open(self, url: str, deadline: Optional[float] = None):
+        for _ in range(self.max_redirects + 1):
+            response, sock = self._request(url, deadline)
+            if response.status not in REDIRECT_CODES:
+                break
+            response.read()
+            url = urljoin(url, response.headers["Location"])
+        if response.status >= 400:
+            body = response.read()
+            raise HTTPError(
+                url, response.status, response.reason, response.headers, io.BytesIO(body)
+            )
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            response = GzipResponse(response)
+        if deadline is not None:
+            response = DeadlineResponse(response, sock, self.read_timeout, deadline)
+        return response
+
+    def close(self):
+        """Close the connections opened by the calling thread."""
+        for conn, _ in self._connections().values():
+            conn.close()
+        self._connections().clear()
+
+    def _connections(self) -> Dict:
+        """(connection, last response) pairs of the calling thread, by host"""
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def _connection(self, scheme: str, netloc: str):
+        connections = self._connections()
+        if (scheme, netloc) in connections:
+            conn, last = connections[(scheme, netloc)]
+            # a response that was not read to the end still occupies the socket
+            if last is not None and not last.isclosed():
+                conn.close()
+            return conn, True
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=self.connect_timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=self.connect_timeout)
+        connections[(scheme, netloc)] = (conn, None)
+        return conn, False
+
+    def _connect(self, conn: http.client.HTTPConnection, deadline: Optional[float]):
+        """Open the socket of `conn` if needed, then switch to the read timeout"""
+        if conn.sock is None:
+            conn.timeout = clamp(self.connect_timeout, deadline)
+            conn.connect()
+        conn.sock.settimeout(clamp(self.read_timeout, deadline))
+
+    def _request(self, url: str, deadline: Optional[float] = None):
+        """Send the request; return the response and the socket it is read from"""
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        conn, reused = self._connection(parts.scheme, parts.netloc)
+        try:
+            self._connect(conn, deadline)
+            conn.request("GET", path, headers=self.headers)
+            # the connection lets go of its socket if the server closes it
+            sock = conn.sock
+            response = conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            self._connect(conn, deadline)
+            conn.request("GET", path, headers=self.headers)
+            sock = conn.sock
+            response = conn.getresponse()
+        self._connections()[(parts.scheme, parts.netloc)] = (conn, response)
+        return response, sock
@@ -0,0 +1,223 @@
+"""
+Throughput benchmarks of the arxivscraper pipeline.
+
+Every stage is run on synthetic OAI pages (see `arxivscraper.testing`)
+for each requested number of pages, and reports records/sec and the
+peak memory traced while running it:
+
+    parse    parsing pages into <record> elements (tree and stream parsers)
+    record   constructing `Record` objects and extracting all their fields
+    output   `Record.output()`, with all fields and with a projection
+    filter   filter evaluation with typical `filters` dictionaries
+    scrape   a full `Scraper.scrape()` against a local FakeOAIServer; beyond
+             100 pages the rendering of the pages by the server is included
+
+Usage:
+
+    python benchmarks/bench.py --pages 1 10 100 --output results.json
+    python benchmarks/bench.py --compare results.json
+
+The results are written as JSON so runs of different commits can be compared.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.arxivscraper import Record
+from arxivscraper.constants import ARXIV, OAI
+from arxivscraper.parsing import PARSERS
+from arxivscraper.testing import FakeOAIServer, render_page
+
+PAGE_SIZE = 1000
+# distinct pages rendered; longer runs cycle through them
+DISTINCT_PAGES = 5
+FILTERS = {
+    "categories": {"categories": ["stat.ml", "cond-mat.soft", "math.pr"]},
+    "abstract": {"abstract": ["neural", "galaxy", "entropy"]},
+    # keeps about 2% of the records
+    "selective": {"categories": ["stat.ml"]},
+    "mixed": {
+        "categories": ["stat.ml"],
+        "title": ["graph", "spin"],
+        "abstract": ["bayesian inference", "dark matter"],
+        "affiliation": ["cern"],
+    },
+}
+
+
+def _meta(record):
+    return record.find(OAI + "metadata").find(ARXIV + "arXiv")
+
+
+class Bench(object):
+    def __init__(self, n_pages):
+        self.n_pages = n_pages
+        self.n_records = n_pages * PAGE_SIZE
+        n = DISTINCT_PAGES * PAGE_SIZE
+        self.bodies = [render_page(cursor, n, PAGE_SIZE) for cursor in range(0, n, PAGE_SIZE)]
+
+    def pages(self):
+        return itertools.islice(itertools.cycle(self.bodies), self.n_pages)
+
+    def parse(self, parser):
+        for body in self.pages():
+            for _ in PARSERS[parser](io.BytesIO(body)):
+                pass
+
+    def records(self, output=False, fields=None):
+        for body in self.pages():
+            for record in PARSERS["tree"](io.BytesIO(body)):
+                record = Record(_meta(record))
+                if output:
+                    record.output(fields)
+                else:
+                    # fields are extracted lazily, time the extraction too
+                    record.materialize()
+
+    def filter(self, filters):
+        scraper = arxivscraper.Scraper(category="physics:cond-mat", filters=filters)
+        for body in self.pages():
+            for _ in scraper._filter_page(PARSERS["tree"](io.BytesIO(body))):
+                pass
+
+    def scrape(self, server, parser):
+        scraper = arxivscraper.Scraper(
+            category="physics:cond-mat",
+            base_url=server.url,
+            parser=parser,
+            timeout=float("inf"),
+        )
+        for _ in scraper.iter_records():
+            pass
+
+    def cases(self):
+        yield "parse[tree]", lambda: self.parse("tree")
+        yield "parse[stream]", lambda: self.parse("stream")
+        yield "record", lambda: self.records()
+        yield "output", lambda: self.records(output=True)
+        yield "output[id,categories]", lambda: self.records(True, ["id", "categories"])
+        for name, filters in sorted(FILTERS.items()):
+            yield "filter[%s]" % name, lambda filters=filters: self.filter(filters)
+        # rendered pages are kept by the server (up to 100) so that repeated
+        # runs measure the scraper rather than the rendering of the pages
+        server = FakeOAIServer(
+            n_records=self.n_records, page_size=PAGE_SIZE, cache_pages=min(self.n_pages, 100)
+        )
+        with server:
+            yield "scrape[tree]", lambda: self.scrape(server, "tree")
+            yield "scrape[stream]", lambda: self.scrape(server, "stream")
+
+
+def measure(func, repeat):
+    """Return the best wall time of `repeat` runs and the traced peak memory."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - t0)
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def git_commit():
+    try:
+        out = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        )
+        return out.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(page_counts, repeat, stages=None):
+    results = []
+    for n_pages in page_counts:
+        bench = Bench(n_pages)
+        for name, func in bench.cases():
+            if stages and name.split("[")[0] not in stages:
+                continue
+            seconds, peak = measure(func, repeat)
+            results.append(
+                {
+                    "stage": name,
+                    "pages": n_pages,
+                    "records": bench.n_records,
+                    "seconds": round(seconds, 6),
+                    "records_per_sec": round(bench.n_records / seconds, 1),
+                    "peak_bytes": peak,
+                }
+            )
+            print(
+                "{stage:<24} {pages:>5} pages {records_per_sec:>12,.0f} rec/s "
+                "{peak_mb:>8.1f} MB peak".format(peak_mb=peak / 2 ** 20, **results[-1]),
+                file=sys.stderr,
+            )
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(old, new):
+    """Print the speed and memory ratios of `new` over `old` for matching cases."""
+    previous = {(r["stage"], r["pages"]): r for r in old["results"]}
+    print("{:<20} {:>5} {:>10} {:>10}".format("stage", "pages", "speed", "memory"))
+    for r in new["results"]:
+        o = previous.get((r["stage"], r["pages"]))
+        if o is None:
+            continue
+        print(
+            "{:<20} {:>5} {:>9.2f}x {:>9.2f}x".format(
+                r["stage"],
+                r["pages"],
+                r["records_per_sec"] / o["records_per_sec"],
+                r["peak_bytes"] / max(o["peak_bytes"], 1),
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100],
+                        help="page counts to run (1000 records each)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="compare with the JSON results of a previous run")
+    args = parser.parse_args(argv)
+
+    report = run(args.pages, args.repeat, args.stages)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,11 @@ setup(
     download_url = 'https://github.com/Mahdisadjadi/arxivscraper/archive/0.0.2.tar.gz',
     py_modules = [""],
     packages=find_packages(),
+    extras_require = {
+        "pandas": ["pandas"],
+        "arrow": ["pyarrow"],
+        "parquet": ["pyarrow"],
+        },
     keywords = ["arxiv", "scraper", "api", "citation"],
     license = "MIT",
     classifiers = [
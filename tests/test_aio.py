@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.aio import AsyncHTTPClient, AsyncRateLimiter, AsyncScraper, merge
+from arxivscraper.parsing import OAIError
+from arxivscraper.ratelimit import RateLimiter
+from arxivscraper.testing import FakeOAIServer, render_page
+
+
+def kwargs(server, **extra):
+    return dict(
+        category="physics:cond-mat",
+        date_from="2017-05-27",
+        date_until="2017-05-30",
+        base_url=server.url,
+        **extra
+    )
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+def test_async_scrape_matches_sync_scrape():
+    with FakeOAIServer(n_records=2500, page_size=1000) as server:
+        expected = arxivscraper.Scraper(**kwargs(server)).scrape()
+        query = "categories:math.ap AND abstract:quantum"
+        expected_filtered = arxivscraper.Scraper(**kwargs(server, query=query)).scrape()
+        scraper = AsyncScraper(**kwargs(server, query=query))
+
+        async def main():
+            try:
+                unfiltered = await AsyncScraper(**kwargs(server)).ascrape()
+                filtered = [record async for record in scraper.aiter_records()]
+                return unfiltered, filtered
+            finally:
+                await scraper.aclose()
+
+        unfiltered, filtered = run(main())
+        assert unfiltered == expected
+        assert filtered == expected_filtered
+        assert 0 < len(filtered) < len(expected)
+        assert scraper.emitted == len(filtered)
+
+
+def test_async_retry_after_503():
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=2) as server:
+        output = run(AsyncScraper(**kwargs(server, t=0)).ascrape())
+        assert len(output) == 30
+        assert server.requests == 5
+
+
+def test_concurrent_harvests_share_limiter():
+    with FakeOAIServer(n_records=30, page_size=10, delay=0.05) as server:
+        limiter = AsyncRateLimiter(0.01)
+        scrapers = [AsyncScraper(**kwargs(server, limiter=limiter)) for _ in range(3)]
+
+        async def main():
+            return [record async for record in merge(*(s.aiter_records() for s in scrapers))]
+
+        output = run(main())
+        assert len(output) == 90
+        assert server.requests == 9
+
+
+def test_async_limiter_spaces_requests():
+    limiter = AsyncRateLimiter(0.05)
+
+    async def main():
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        await asyncio.gather(*(limiter.wait() for _ in range(3)))
+        return loop.time() - start
+
+    assert run(main()) >= 0.09
+
+
+def test_async_body_download_is_retried():
+    body = render_page(0, 10, 10)
+    served = []
+
+    async def handle(reader, writer):
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        served.append(1)
+        head = "HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body)
+        # the first response breaks off after a few bytes
+        writer.write(head.encode() + (body[:50] if len(served) == 1 else body))
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        scraper = AsyncScraper(
+            category="physics:cond-mat", t=0, base_url="http://127.0.0.1:%d/oai2?verb=ListRecords&" % port
+        )
+        try:
+            return scraper, await scraper.ascrape()
+        finally:
+            server.close()
+
+    scraper, output = run(main())
+    assert len(output) == 10
+    assert len(served) == 2
+    assert scraper.retry.retries == 1
+
+
+def test_client_closed_after_harvest():
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+
+        async def main():
+            async with AsyncScraper(**kwargs(server)) as scraper:
+                output = await scraper.ascrape()
+                assert not scraper.client._idle and not scraper.client._busy
+                return output
+
+        assert len(run(main())) == 30
+
+
+def test_sync_limiter_waits_in_thread():
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        limiter = RateLimiter(0.001)
+        output = run(AsyncScraper(**kwargs(server, limiter=limiter)).ascrape())
+        assert len(output) == 30
+        with pytest.raises(TypeError):
+            AsyncScraper(**kwargs(server, limiter=3))
+
+
+def test_async_oai_error():
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        scraper = AsyncScraper(**kwargs(server))
+        scraper.url = server.url + "resumptionToken=expired"
+        with pytest.raises(OAIError, match="badResumptionToken"):
+            run(scraper.ascrape())
+        assert not scraper.complete
+
+
+def test_client_shared_by_concurrent_harvests():
+    with FakeOAIServer(n_records=4000, page_size=1000, delay=0.02) as server:
+        expected = [r["id"] for r in arxivscraper.Scraper(**kwargs(server)).scrape()] * 6
+
+        async def main():
+            client = AsyncHTTPClient()
+            scrapers = [AsyncScraper(**kwargs(server, client=client)) for _ in range(6)]
+            try:
+                return [record async for record in merge(*(s.aiter_records() for s in scrapers))]
+            finally:
+                await client.close()
+
+        assert sorted(r["id"] for r in run(main())) == sorted(expected)
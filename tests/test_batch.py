@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.batch import NULL_DATE, RecordBatch
+from arxivscraper.testing import FakeOAIServer
+
+
+def test_iter_batches_matches_records():
+    with FakeOAIServer(n_records=25, page_size=10) as server:
+        kwargs = dict(category="physics:cond-mat", base_url=server.url)
+        batches = list(arxivscraper.Scraper(**kwargs).iter_batches())
+        records = arxivscraper.Scraper(**kwargs).scrape()
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    columns = {}
+    for batch in batches:
+        for field, values in batch.to_pydict().items():
+            columns.setdefault(field, []).extend(values)
+    for field in ("id", "title", "authors", "created", "updated"):
+        assert columns[field] == [record[field] for record in records]
+    assert columns["categories"] == [record["categories"] for record in records]
+
+
+def test_batch_columns():
+    batch = RecordBatch(["id", "created", "updated", "categories"])
+    batch.append({"id": "1", "created": "1970-01-02", "updated": "", "categories": "math.co stat.ml"})
+    batch.append({"id": "2", "created": "2017-05-28", "updated": "", "categories": "cs.lg"})
+    assert batch.columns["created"].typecode == "i"
+    assert list(batch.columns["created"]) == [1, 17314]
+    assert list(batch.columns["updated"]) == [NULL_DATE, NULL_DATE]
+    assert list(batch.category_offsets) == [0, 2, 3]
+    assert (bytes(batch.id_data), list(batch.id_offsets)) == (b"12", [0, 1, 2])
+    assert batch.ids() == ["1", "2"]
+    assert batch.categories() == [["math.co", "stat.ml"], ["cs.lg"]]
+    assert batch.to_pydict()["created"] == ["1970-01-02", "2017-05-28"]
+    table = batch.category_table
+    assert batch.category_masks() == [table.mask(["math.co", "stat.ml"]), table.mask(["cs.lg"])]
+    assert table.counts(batch.category_masks())["stat.ml"] == 1
+    with pytest.raises(ValueError):
+        RecordBatch(["id"]).category_masks()
+
+
+def test_to_arrow():
+    pytest.importorskip("pyarrow")
+    batch = RecordBatch(["id", "created", "updated", "categories", "authors"])
+    batch.append({"id": "1", "created": "2017-05-28", "updated": "", "categories": "stat.ml math.co",
+                  "authors": ["jane doe"]})
+    table = batch.to_arrow()
+    assert table.column("id").to_pylist() == ["1"]
+    row = table.to_pylist()[0]
+    assert str(row["created"]) == "2017-05-28" and row["updated"] is None
+    assert row["categories"] == ["stat.ml", "math.co"]
+    assert row["authors"] == ["jane doe"]
+
+
+def test_to_pandas():
+    pytest.importorskip("pandas")
+    batch = RecordBatch(["id", "created", "updated", "categories"])
+    batch.append({"id": "1705.00001", "created": "2017-05-28", "updated": "", "categories": "stat.ml math.co"})
+    frame = batch.to_pandas()
+    assert list(frame.columns) == ["id", "created", "updated", "categories"]
+    assert frame["id"].tolist() == ["1705.00001"]
+    assert str(frame["created"][0].date()) == "2017-05-28"
+    assert frame["updated"].isna().all()
+    assert frame["categories"][0] == ["stat.ml", "math.co"]
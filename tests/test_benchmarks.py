@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
+
+import bench
+
+
+def test_bench_report():
+    report = bench.run([1], repeat=1, stages=["parse", "filter"])
+    stages = [result["stage"] for result in report["results"]]
+    assert stages == [
+        "parse[tree]", "parse[stream]",
+        "filter[abstract]", "filter[categories]", "filter[mixed]", "filter[selective]",
+    ]
+    assert all(result["records"] == 1000 for result in report["results"])
@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.cache import ResponseCache
+from arxivscraper.testing import FakeOAIServer, render_error
+from arxivscraper.transport import HTTPTransport
+from test_streaming import FakeTransport, make_page
+
+
+def scrape(transport, cache, parser="tree"):
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat",
+        date_from="2017-05-27",
+        date_until="2017-05-30",
+        transport=transport,
+        cache=cache,
+        parser=parser,
+    )
+    return [record["id"] for record in scraper.iter_records()]
+
+
+def test_second_run_is_served_from_cache(tmp_path):
+    pages = [make_page(["1", "2"], token="t1"), make_page(["3"])]
+    for parser in ("tree", "stream"):
+        cache = str(tmp_path / parser)
+        assert scrape(FakeTransport(pages), cache, parser) == ["1", "2", "3"]
+        transport = FakeTransport([])
+        assert scrape(transport, cache, parser) == ["1", "2", "3"]
+        assert transport.requested == []
+
+
+def test_ttl_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=None)
+    for key in ("a", "b", "c"):
+        cache.wrap(key, io.BytesIO(os.urandom(1000))).read()
+    assert cache.open("a").read()
+    # "b" is the least recently used entry
+    os.utime(cache.path("b"), (time.time() - 10, os.stat(cache.path("b")).st_mtime))
+    cache.max_bytes = cache.size - 1
+    cache._evict()
+    assert cache.open("b") is None
+    assert cache.open("a") is not None and cache.open("c") is not None
+
+    created = time.time() - 120
+    os.utime(cache.path("a"), (created, created))
+    assert cache.open("a") is None
+    assert cache.open("c", closed=True) is not None
+
+
+def test_partial_read_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    response = cache.wrap("a", io.BytesIO(b"x" * 100))
+    response.read(10)
+    response.close()
+    assert cache.open("a") is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_keep_alive_response_without_gzip(tmp_path):
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        scraper = arxivscraper.Scraper(
+            category="physics:cond-mat",
+            date_from="2017-05-27",
+            date_until="2017-05-30",
+            base_url=server.url,
+            cache=str(tmp_path),
+            transport=HTTPTransport(compress=False, read_timeout=2),
+        )
+        start = time.monotonic()
+        assert len(scraper.scrape()) == 30
+        assert time.monotonic() - start < 2
+        assert len(scraper.scrape()) == 30
+        assert server.requests == 3
+
+
+class TokenTransport(object):
+    """Serve pages by resumption token; tokens of other runs are rejected."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def open(self, url):
+        token = url.partition("resumptionToken=")[2]
+        self.requested.append(token)
+        return io.BytesIO(self.pages[token])
+
+
+def test_partial_cache_hit_gets_a_fresh_token(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    old = [make_page(["1", "2"], token="old1"), make_page(["3"], token="old2"), make_page(["4"])]
+    assert scrape(FakeTransport(old), cache) == ["1", "2", "3", "4"]
+    scraper = arxivscraper.Scraper(category="physics:cond-mat", date_from="2017-05-27", date_until="2017-05-30")
+    os.remove(cache.path(cache.key(scraper.url, 3)))
+
+    transport = TokenTransport({
+        "": make_page(["1", "2"], token="new1"),
+        "new1": make_page(["3"], token="new2"),
+        "new2": make_page(["4"]),
+    })
+    assert scrape(transport, cache) == ["1", "2", "3", "4"]
+    assert transport.requested == ["", "new1", "new2"]
+
+
+def test_error_response_is_not_cached(tmp_path):
+    cache = str(tmp_path)
+    error = [make_page(["1"], token="t1"), render_error("badResumptionToken")]
+    with pytest.raises(arxivscraper.OAIError):
+        scrape(FakeTransport(error), cache)
+    transport = FakeTransport([make_page(["1"], token="t2"), make_page(["2"])])
+    assert scrape(transport, cache) == ["1", "2"]
+
+
+def test_cache_not_mixed_with_fresh_pages(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    old = [make_page(["1", "2"], token="old1"), make_page(["3"], token="old2"), make_page(["4"])]
+    assert scrape(FakeTransport(old), cache) == ["1", "2", "3", "4"]
+    scraper = arxivscraper.Scraper(category="physics:cond-mat", date_from="2017-05-27", date_until="2017-05-30")
+    # the first page expired while the later ones, of the old list, are still cached
+    os.remove(cache.path(cache.key(scraper.url, 1)))
+
+    transport = TokenTransport({
+        "": make_page(["0", "1"], token="new1"),
+        "new1": make_page(["2", "3"], token="new2"),
+        "new2": make_page(["4", "5"]),
+    })
+    expected = ["0", "1", "2", "3", "4", "5"]
+    assert scrape(transport, cache) == expected
+    assert transport.requested == ["", "new1", "new2"]
+    assert scrape(FakeTransport([]), cache) == expected
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import arxivscraper
+from arxivscraper.aio import AsyncScraper
+from arxivscraper.ratelimit import FileRateLimiter, RateLimiter
+from arxivscraper.retry import RetryPolicy
+from arxivscraper.sinks import JSONLSink
+from arxivscraper.testing import FakeOAIServer
+from arxivscraper.transport import UrllibTransport
+
+
+def kwargs(server, **extra):
+    return dict(
+        category="physics:cond-mat",
+        date_from="2017-05-27",
+        date_until="2017-05-30",
+        base_url=server.url,
+        **extra
+    )
+
+
+def test_deadline_includes_retry_waits(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=2, retry_after=5) as server:
+        scraper = arxivscraper.Scraper(**kwargs(server, timeout=1, checkpoint=path))
+        start = time.monotonic()
+        output = scraper.scrape()
+        assert time.monotonic() - start < 1
+        assert len(output) == 10
+        assert scraper.stopped == "deadline"
+        assert scraper.resumption_token == "fake|10"
+        assert json.load(open(path))["token"] == "fake|10"
+
+
+def test_cancel_at_page_boundary(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        for prefetch in (0, 2):
+            cancel = threading.Event()
+            scraper = arxivscraper.Scraper(
+                **kwargs(server, cancel=cancel, checkpoint=path, prefetch=prefetch)
+            )
+            output = []
+            for record in scraper.iter_records():
+                output.append(record)
+                if len(output) == 15:
+                    cancel.set()
+            # the page being consumed is finished
+            assert len(output) == 20
+            assert scraper.stopped == "cancelled"
+            assert scraper.resumption_token == "fake|20"
+        rest = arxivscraper.Scraper(**kwargs(server, checkpoint=path, resume=True)).scrape()
+        assert [r["id"] for r in output + rest] == [
+            r["id"] for r in arxivscraper.Scraper(**kwargs(server)).scrape()
+        ]
+
+
+def test_cancel_interrupts_retry_wait(tmp_path):
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=2, retry_after=30) as server:
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        scraper = arxivscraper.Scraper(**kwargs(server, cancel=cancel))
+        start = time.monotonic()
+        with JSONLSink(str(tmp_path / "out.jsonl")) as sink:
+            stats = scraper.scrape(sink=sink)
+        assert time.monotonic() - start < 5
+        assert stats["records"] == 10
+        assert stats["stopped"] == "cancelled"
+        assert stats["resumption_token"] == "fake|10"
+
+
+def test_read_timeout():
+    with FakeOAIServer(n_records=10, delay=1) as server:
+        scraper = arxivscraper.Scraper(
+            **kwargs(server, read_timeout=0.1, retry=RetryPolicy(max_retries=0))
+        )
+        start = time.monotonic()
+        with pytest.raises(socket.timeout):
+            scraper.scrape()
+        assert time.monotonic() - start < 0.9
+
+
+def test_async_deadline_and_cancel():
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=2, retry_after=5) as server:
+        scraper = AsyncScraper(**kwargs(server, timeout=1))
+        output = asyncio.new_event_loop().run_until_complete(scraper.ascrape())
+        assert len(output) == 10
+        assert scraper.stopped == "deadline"
+        assert scraper.resumption_token == "fake|10"
+
+        async def cancelled():
+            cancel = asyncio.Event()
+            scraper = AsyncScraper(**kwargs(server, cancel=cancel))
+            asyncio.get_event_loop().call_later(0.2, cancel.set)
+            return scraper, await scraper.ascrape()
+
+        scraper, output = asyncio.new_event_loop().run_until_complete(cancelled())
+        assert scraper.stopped == "cancelled"
+        assert len(output) == 10
+
+
+def test_deadline_cuts_requests_in_flight():
+    with FakeOAIServer(n_records=10, delay=3) as server:
+        for options in ({}, {"parser": "stream"}, {"prefetch": 2}, {"transport": UrllibTransport()}):
+            scraper = arxivscraper.Scraper(**kwargs(server, timeout=0.5, **options))
+            start = time.monotonic()
+            assert scraper.scrape() == []
+            assert time.monotonic() - start < 1
+            assert scraper.stopped == "deadline"
+
+        scraper = AsyncScraper(**kwargs(server, timeout=0.5))
+        start = time.monotonic()
+        assert asyncio.new_event_loop().run_until_complete(scraper.ascrape()) == []
+        assert time.monotonic() - start < 1
+        assert scraper.stopped == "deadline"
+
+
+def test_limiter_waits_end_at_deadline_and_cancel(tmp_path):
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        scraper = arxivscraper.Scraper(**kwargs(server, timeout=0.5, limiter=RateLimiter(30)))
+        start = time.monotonic()
+        assert len(scraper.scrape()) == 10
+        assert time.monotonic() - start < 0.5
+        assert scraper.stopped == "deadline"
+
+    limiter = FileRateLimiter(str(tmp_path / "bucket"), rate=1, per=30)
+    assert limiter.wait()
+    assert not limiter.wait(deadline=time.monotonic() + 1)
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    start = time.monotonic()
+    assert not limiter.wait(cancel=cancel)
+    assert time.monotonic() - start < 1
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arxivscraper.categories import category_matcher, is_known, parse_categories
+from arxivscraper.filters import compile_filters
+
+
+def test_parse_categories():
+    codes = parse_categories("Math.CO  stat.ML cs.LG")
+    assert codes == frozenset(["math.co", "stat.ml", "cs.lg"])
+    assert parse_categories("math.co stat.ml cs.lg") is parse_categories("math.co stat.ml cs.lg")
+    assert is_known("stat.ml") and is_known("math") and not is_known("cs.lg")
+
+
+def test_category_matcher():
+    codes = parse_categories("math.ct stat.mlx")
+    assert not category_matcher(["math.co", "stat.ml"])(codes)
+    assert category_matcher(["math.*"])(codes)
+    assert category_matcher(["stat"])(codes)
+    assert not category_matcher(["cond-mat"])(parse_categories("physics.comp-ph"))
+
+
+def test_category_filter_on_dicts():
+    match = compile_filters({"categories": ["stat.ML"]})
+    assert match({"categories": "cs.lg stat.ml"})
+    assert not match({"categories": "stat.mlx"})
+
+
+def test_category_table():
+    from arxivscraper.categories import CategoryTable
+
+    table = CategoryTable(["math.co", "stat.ml", "math.ct"])
+    a = table.mask(parse_categories("math.co stat.ml"))
+    b = table.mask(parse_categories("math.ct cs.lg"))
+    assert table.code("cs.lg") == 3 and len(table) == 4
+    assert table.names(a & table.mask_for(["math.*"])) == frozenset(["math.co"])
+    assert table.mask_for(["math"]) & b
+    assert not a & b
+    assert table.counts([a, b, a]) == {"math.co": 2, "stat.ml": 2, "math.ct": 1, "cs.lg": 1}
+
+
+def test_category_table_to_words():
+    pytest.importorskip("numpy")
+    from arxivscraper.categories import CategoryTable
+
+    table = CategoryTable("c%d" % i for i in range(70))
+    words = table.to_words([table.mask(["c0", "c63"]), table.mask(["c64", "c69"]), 0])
+    assert words.shape == (3, 2) and words.dtype.name == "uint64"
+    assert words.tolist() == [[1 | 1 << 63, 0], [0, 1 | 1 << 5], [0, 0]]
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import threading
+from urllib.error import HTTPError
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.retry import RetryPolicy
+from arxivscraper.sinks import JSONLSink
+from arxivscraper.testing import FakeOAIServer
+from test_retry import BrokenBody
+from test_streaming import FakeTransport, make_page
+
+
+class FailingTransport(FakeTransport):
+    """Fail with HTTP 500 on the `fail_at`-th request."""
+
+    def __init__(self, pages, fail_at):
+        FakeTransport.__init__(self, pages)
+        self.fail_at = fail_at
+
+    def open(self, url):
+        if len(self.requested) + 1 == self.fail_at:
+            self.fail_at = None
+            raise HTTPError(url, 500, "Internal Server Error", {}, None)
+        return FakeTransport.open(self, url)
+
+
+def scraper(transport, path, resume=False):
+    return arxivscraper.Scraper(
+        category="physics:cond-mat",
+        date_from="2017-05-27",
+        date_until="2017-05-30",
+        transport=transport,
+        checkpoint=path,
+        resume=resume,
+        retry=RetryPolicy(max_retries=0),
+    )
+
+
+def test_resume_after_failure(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    pages = [make_page(["1", "2"], token="t1"), make_page(["3"], token="t2"), make_page(["4"])]
+    transport = FailingTransport(pages, fail_at=3)
+    records = []
+    with pytest.raises(HTTPError):
+        for record in scraper(transport, path).iter_records():
+            records.append(record["id"])
+    assert records == ["1", "2", "3"]
+    state = json.load(open(path))
+    assert (state["token"], state["emitted"], state["complete"]) == ("t2", 3, False)
+
+    resumed = scraper(FakeTransport(pages[2:]), path, resume=True)
+    assert [r["id"] for r in resumed.iter_records()] == ["4"]
+    assert resumed.transport.requested[0].endswith("resumptionToken=t2")
+    assert json.load(open(path))["complete"]
+    assert scraper(FakeTransport([]), path, resume=True).scrape() == []
+
+
+def test_resume_other_window(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    scraper(FakeTransport([make_page(["1"])]), path).scrape()
+    other = arxivscraper.Scraper(category="stat", checkpoint=path, resume=True)
+    with pytest.raises(ValueError):
+        other.scrape()
+
+
+def test_incremental_harvest(tmp_path):
+    path = str(tmp_path / "state.json")
+    first = arxivscraper.Scraper(
+        category="stat", date_from="2017-05-01", date_until="2017-05-30",
+        transport=FakeTransport([make_page(["1"])]), state=path,
+    )
+    records = first.iter_records()
+    next(records)
+    with pytest.raises(ValueError):
+        first.commit_state()
+    list(records)
+    # the caller has not written the records yet
+    assert not os.path.exists(path)
+    first.commit_state()
+    assert json.load(open(path)) == {"stat": "2017-05-30"}
+
+    second = arxivscraper.Scraper(category="stat", transport=FakeTransport([make_page(["2"])]), state=path)
+    assert "from=2017-05-30&" in second.url
+    with JSONLSink(str(tmp_path / "out.jsonl")) as sink:
+        second.scrape(sink=sink)
+    assert json.load(open(path))["stat"] > "2017-05-30"
+
+
+def test_incremental_harvest_not_advanced_on_failure(tmp_path):
+    path = str(tmp_path / "state.json")
+    pages = [make_page(["1"], token="t1"), make_page(["2"])]
+    scraper = arxivscraper.Scraper(
+        category="stat", date_from="2017-05-01", date_until="2017-05-30",
+        transport=FailingTransport(pages, fail_at=2), state=path,
+        retry=RetryPolicy(max_retries=0),
+    )
+    with pytest.raises(HTTPError):
+        scraper.scrape()
+    assert not os.path.exists(path)
+
+
+def test_sink_checkpoint_not_complete_when_stream_page_stopped(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    state = str(tmp_path / "state.json")
+
+    class DroppingTransport(FakeTransport):
+        def open(self, url):
+            response = FakeTransport.open(self, url)
+            return BrokenBody(response.read()) if len(self.requested) == 2 else response
+
+    scraper = arxivscraper.Scraper(
+        category="stat", date_from="2017-05-01", date_until="2017-05-30",
+        transport=DroppingTransport([make_page(["1"], token="t1"), make_page(["2"])]),
+        parser="stream", checkpoint=path, state=state, timeout=1,
+        retry=RetryPolicy(backoff=10, jitter=0),
+    )
+    with JSONLSink(str(tmp_path / "out.jsonl")) as sink:
+        stats = scraper.scrape(sink=sink)
+    assert (stats["stopped"], stats["pages"], stats["resumption_token"]) == ("deadline", 1, "t1")
+    checkpoint = json.load(open(path))
+    assert (checkpoint["token"], checkpoint["complete"]) == ("t1", False)
+    assert not os.path.exists(state)
+
+
+def test_resume_with_expired_token(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    pages = [make_page(["1"], token="t1"), make_page(["2"])]
+    with pytest.raises(HTTPError):
+        list(scraper(FailingTransport(pages, fail_at=2), path).iter_records())
+    with FakeOAIServer() as server:
+        # the server has never issued the token t1
+        for options in ({"parser": "tree"}, {"parser": "stream"}, {"prefetch": 2}):
+            resumed = arxivscraper.Scraper(
+                category="physics:cond-mat", date_from="2017-05-27", date_until="2017-05-30",
+                base_url=server.url, checkpoint=path, resume=True, **options
+            )
+            with pytest.raises(arxivscraper.OAIError):
+                resumed.scrape()
+            assert json.load(open(path))["token"] == "t1"
+            assert not json.load(open(path))["complete"]
+
+
+def test_scrape_saves_checkpoint_when_it_returns(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    pages = [make_page(["1", "2"], token="t1"), make_page(["3"], token="t2"), make_page(["4"])]
+    with pytest.raises(HTTPError):
+        scraper(FailingTransport(pages, fail_at=3), path).scrape()
+    # the records were never returned, so none is skipped by the next run
+    assert not os.path.exists(path)
+    assert [r["id"] for r in scraper(FakeTransport(pages), path, resume=True).scrape()] == ["1", "2", "3", "4"]
+    assert json.load(open(path))["complete"]
+
+    cancel = threading.Event()
+
+    class CancellingTransport(FakeTransport):
+        def open(self, url):
+            cancel.set()
+            return FakeTransport.open(self, url)
+
+    stopped = arxivscraper.Scraper(
+        category="physics:cond-mat", date_from="2017-05-27", date_until="2017-05-30",
+        transport=CancellingTransport(pages), checkpoint=path, cancel=cancel,
+    )
+    assert [r["id"] for r in stopped.scrape()] == ["1", "2"]
+    assert stopped.stopped == "cancelled"
+    state = json.load(open(path))
+    assert (state["token"], state["emitted"], state["complete"]) == ("t1", 2, False)
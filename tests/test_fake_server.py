@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.testing import FakeOAIServer
+from arxivscraper.transport import UrllibTransport
+
+
+def scraper(server, **kwargs):
+    return arxivscraper.Scraper(
+        category="physics:cond-mat",
+        date_from="2017-05-27",
+        date_until="2017-05-30",
+        base_url=server.url,
+        **kwargs
+    )
+
+
+def test_offline_scrape():
+    with FakeOAIServer(n_records=2500, page_size=1000) as server:
+        output = scraper(server).scrape()
+        assert len(output) == 2500
+        assert len(set(record["id"] for record in output)) == 2500
+        assert server.requests == 3
+        streamed = scraper(server, parser="stream", transport=UrllibTransport()).scrape()
+        assert streamed == output
+
+
+def test_retry_after_503():
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=2) as server:
+        output = scraper(server, t=0).scrape()
+        assert len(output) == 30
+        assert server.requests == 5
+
+
+def test_records_are_deterministic():
+    with FakeOAIServer(n_records=10) as a, FakeOAIServer(n_records=10) as b:
+        assert scraper(a).scrape() == scraper(b).scrape()
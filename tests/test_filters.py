@@ -0,0 +1,57 @@
+import os
+import re
+import sys
+import warnings
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arxivscraper.filters import _trie_pattern, compile_filters
+
+RECORD = {
+    "id": "1705.00001",
+    "title": "graph neural networks",
+    "abstract": "we study spin glasses",
+    "categories": "cond-mat.dis-nn stat.ml",
+    "authors": ["jane doe", "john smith"],
+    "affiliation": ["mit"],
+}
+
+
+def test_trie_pattern():
+    words = ["graph", "gravity", "grav", "spin", "a.b"]
+    pattern = re.compile(_trie_pattern(words))
+    for word in words:
+        assert pattern.fullmatch(word)
+    assert not pattern.fullmatch("gra")
+    assert not pattern.fullmatch("axb")
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"title": ["Neural"]}, True),
+        ({"abstract": ["quantum", "glass"]}, True),
+        ({"abstract": ["quantum"], "categories": ["stat.ML"]}, True),
+        ({"authors": ["jane doe"]}, True),
+        ({"author": ["jane"]}, False),
+        ({"affiliation": ["cern"], "title": "transformer"}, False),
+    ],
+)
+def test_compile_filters(filters, expected):
+    assert compile_filters(filters)(RECORD) is expected
+
+
+def test_unknown_key():
+    with pytest.raises(ValueError):
+        compile_filters({"journal": ["nature"]})
+
+
+def test_unknown_category_warns():
+    with pytest.warns(UserWarning, match="'sta.ml'"):
+        match = compile_filters({"categories": ["sta.ml", "math.*"]})
+    assert not match(RECORD)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        compile_filters({"categories": ["stat.ML", "cond-mat", "math.*"]})
@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+import time
+from urllib.error import HTTPError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import arxivscraper
+from arxivscraper.parsing import OAIError
+from arxivscraper.pipeline import scan_token
+from arxivscraper.retry import RetryPolicy
+from arxivscraper.testing import FakeOAIServer, render_error, render_page
+from test_streaming import make_page
+
+
+def scraper(server, **kwargs):
+    return arxivscraper.Scraper(
+        category="physics:cond-mat",
+        date_from="2017-05-27",
+        date_until="2017-05-30",
+        base_url=server.url,
+        **kwargs
+    )
+
+
+def test_scan_token():
+    assert scan_token(render_page(0, 2500, 1000)) == "fake|1000"
+    assert scan_token(render_page(2000, 2500, 1000)) is None
+    assert scan_token(make_page(["a", "b"], token="6960524|1001")) == "6960524|1001"
+    assert scan_token(make_page(["a"], token="x&amp;y")) == "x&y"
+    assert scan_token(make_page(["a"])) is None
+    assert scan_token(render_error("noRecordsMatch")) is None
+    with pytest.raises(OAIError) as error:
+        scan_token(render_error("badResumptionToken", "expired & gone"))
+    assert (error.value.code, error.value.message) == ("badResumptionToken", "expired & gone")
+
+
+def test_prefetch_matches_serial_scrape():
+    with FakeOAIServer(n_records=3500, page_size=500) as server:
+        query = "categories:math.ap OR abstract:quantum"
+        expected = scraper(server, query=query).scrape()
+        output = scraper(server, query=query, prefetch=2, parse_workers=3).scrape()
+        assert output == expected
+        fields = ["id", "categories", "created"]
+        batches = list(scraper(server, fields=fields, prefetch=1).iter_batches())
+        assert len(batches) == 7
+        assert [row for b in batches for row in b.to_pydict()["id"]] == [
+            r["id"] for r in scraper(server).scrape()
+        ]
+
+
+def test_prefetch_checkpoint_and_resume(tmp_path):
+    path = str(tmp_path / "harvest.json")
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        records = scraper(server, checkpoint=path, prefetch=2).iter_records()
+        first = [next(records) for _ in range(15)]
+        records.close()
+        rest = scraper(server, checkpoint=path, resume=True, prefetch=2).scrape()
+        expected = [r["id"] for r in scraper(server).scrape()]
+        assert [r["id"] for r in first] == expected[:15]
+        assert [r["id"] for r in rest] == expected[10:]
+
+
+def test_prefetch_raises_fetch_errors():
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        bad = scraper(server, prefetch=2)
+        bad.url = server.url + "resumptionToken=bad"
+        # raised by scan_token in the fetch thread
+        with pytest.raises(OAIError):
+            bad.scrape()
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=1) as server:
+        with pytest.raises(HTTPError):
+            scraper(server, prefetch=2, retry=RetryPolicy(max_retries=0)).scrape()
+
+
+def test_early_stop_interrupts_retry_wait():
+    for options in ({}, {"cancel": threading.Event()}):
+        with FakeOAIServer(n_records=30, page_size=10, fail_every=2, retry_after=5) as server:
+            records = scraper(server, prefetch=2, **options).iter_records()
+            next(records)
+            # the fetch thread is waiting 5s to retry the second page
+            time.sleep(0.2)
+            start = time.monotonic()
+            records.close()
+            assert time.monotonic() - start < 1
+            assert server.requests == 2
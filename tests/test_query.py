@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.query import And, Not, Or, QuerySyntaxError, Term, compile_query, parse_query
+from test_filters import RECORD
+from test_streaming import FakeTransport, make_page
+
+
+def test_parse_query():
+    tree = parse_query('categories:stat.ML AND (abstract:"graph neural" OR title:gnn) NOT title:survey')
+    assert tree == And(
+        [
+            Term("categories", "stat.ml"),
+            Or([Term("abstract", "graph neural"), Term("title", "gnn")]),
+            Not(Term("title", "survey")),
+        ]
+    )
+    assert parse_query("a OR b c") == Or([Term(None, "a"), And([Term(None, "b"), Term(None, "c")])])
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("categories:stat.ml AND title:graph", True),
+        ("categories:stat.ml AND NOT title:graph", False),
+        ('abstract:"spin glasses" OR title:survey', True),
+        ("spin AND NOT (author:\"jane doe\" OR affiliation:cern)", False),
+        ("title:survey OR title:review OR neural", True),
+    ],
+)
+def test_compile_query(query, expected):
+    assert compile_query(query)(RECORD) is expected
+
+
+@pytest.mark.parametrize("query", ["", "title:", "(a OR b", "a AND", "journal:x", 'title:"open'])
+def test_syntax_errors(query):
+    with pytest.raises(QuerySyntaxError):
+        compile_query(query)
+
+
+def test_scraper_query():
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat",
+        query='categories:cond-mat.soft AND NOT title:"paper 1"',
+        transport=FakeTransport([make_page(["1", "2"])]),
+    )
+    assert [r["id"] for r in scraper.scrape()] == ["2"]
+
+
+def test_rejected_records_are_not_parsed(monkeypatch):
+    parsed = []
+    get_text = arxivscraper.Record._get_text
+
+    def spy(self, namespace, tag):
+        parsed.append(tag)
+        return get_text(self, namespace, tag)
+
+    monkeypatch.setattr(arxivscraper.Record, "_get_text", spy)
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat",
+        query="categories:stat.ml",
+        transport=FakeTransport([make_page(["1", "2"])]),
+    )
+    assert scraper.match.fields == frozenset(["categories"])
+    assert scraper.scrape() == []
+    assert parsed == ["categories", "categories"]
+
+
+def test_deleted_records_are_skipped():
+    page = make_page(["1"]).replace(
+        b"<ListRecords>",
+        b'<ListRecords><record><header status="deleted"><identifier>x</identifier></header></record>',
+    )
+    scraper = arxivscraper.Scraper(category="physics:cond-mat", transport=FakeTransport([page]))
+    assert [r["id"] for r in scraper.scrape()] == ["1"]
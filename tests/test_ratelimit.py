@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arxivscraper.ratelimit import FileRateLimiter, RateLimiter
+
+
+def take(path, n, times):
+    limiter = FileRateLimiter(path, rate=1, per=0.05)
+    for _ in range(n):
+        limiter.wait()
+        times.put(time.time())
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(0.02)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.wait()
+    assert time.monotonic() - start >= 0.06
+
+
+def test_file_rate_limiter_is_shared_by_processes(tmp_path):
+    path = str(tmp_path / "bucket")
+    context = multiprocessing.get_context("fork")
+    times = context.Queue()
+    workers = [context.Process(target=take, args=(path, 3, times)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stamps = sorted(times.get() for _ in range(9))
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    # 9 requests at 1 per 0.05s, whatever the number of processes
+    assert stamps[-1] - stamps[0] >= 0.35
+    assert min(gaps) >= 0.025
+
+
+def test_file_rate_limiter_allows_bursts(tmp_path):
+    limiter = FileRateLimiter(str(tmp_path / "bucket"), rate=2, per=1, burst=3)
+    start = time.time()
+    for _ in range(3):
+        limiter.wait()
+    assert time.time() - start < 0.1
+    limiter.wait()
+    assert time.time() - start >= 0.45
@@ -0,0 +1,147 @@
+import email.message
+import io
+import os
+import sys
+from urllib.error import HTTPError, URLError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import arxivscraper
+from arxivscraper.retry import RetryPolicy, retry_after
+from arxivscraper.sinks import JSONLSink
+from arxivscraper.testing import FakeOAIServer
+from test_streaming import make_page
+
+
+def http_error(code, after=None):
+    headers = email.message.Message()
+    if after is not None:
+        headers["Retry-After"] = after
+    return HTTPError("http://x", code, "error", headers, io.BytesIO())
+
+
+class FlakyTransport(object):
+    """Raise the given errors first, then serve a single page."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.requests = 0
+
+    def open(self, url):
+        self.requests += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return io.BytesIO(make_page(["a", "b"]))
+
+
+def test_retry_after_header():
+    assert retry_after("120") == 120
+    assert retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470) == 10
+    assert retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412490) == 0
+    assert retry_after("soon") is None
+    assert retry_after(None) is None
+
+
+def test_delay_honours_retry_after_and_backs_off():
+    policy = RetryPolicy(backoff=2, max_delay=10, jitter=0)
+    assert policy.delay(http_error(503, "120"), 0) == 120
+    assert [policy.delay(http_error(502), k) for k in range(5)] == [2, 4, 8, 10, 10]
+    assert policy.delay(URLError("connection refused"), 0) == 2
+    assert policy.delay(http_error(404), 0) is None
+    assert policy.delay(ValueError(), 0) is None
+    assert policy.retries == 7
+
+    jittered = RetryPolicy(backoff=8, jitter=0.5)
+    assert all(4 <= jittered.delay(http_error(500), 0) <= 8 for _ in range(20))
+
+
+def test_retry_budgets():
+    sleeps = []
+    policy = RetryPolicy(backoff=0, max_retries=2, budget=4)
+    flaky = FlakyTransport([http_error(503)] * 2)
+    assert policy.call(flaky.open, "url", sleep=sleeps.append).read()
+    with pytest.raises(HTTPError):
+        # per-page limit
+        policy.call(FlakyTransport([http_error(503)] * 3).open, "url", sleep=sleeps.append)
+    assert policy.retries == 4
+    with pytest.raises(URLError):
+        # harvest budget already spent
+        policy.call(FlakyTransport([URLError("reset")]).open, "url", sleep=sleeps.append)
+    assert len(sleeps) == 4
+    assert policy.waited == 0
+
+
+def test_scraper_retries_network_errors():
+    transport = FlakyTransport([URLError("reset"), http_error(502), http_error(503, "0")])
+    scraper = arxivscraper.Scraper(category="physics:cond-mat", t=0, transport=transport)
+    assert [r["id"] for r in scraper.scrape()] == ["a", "b"]
+    assert transport.requests == 4
+    assert scraper.retry.retries == 3
+
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat", transport=FlakyTransport([http_error(404)])
+    )
+    with pytest.raises(HTTPError):
+        scraper.scrape()
+
+
+def test_scrape_reports_time_waited(tmp_path):
+    with FakeOAIServer(n_records=30, page_size=10, fail_every=2, retry_after=0) as server:
+        scraper = arxivscraper.Scraper(category="physics:cond-mat", base_url=server.url)
+        with JSONLSink(str(tmp_path / "out.jsonl")) as sink:
+            stats = scraper.scrape(sink=sink)
+        assert stats["records"] == 30
+        assert stats["retries"] == 2
+        assert stats["waited"] == 0
+
+
+class BrokenBody(io.BytesIO):
+    """A response whose connection drops after the first bytes."""
+
+    def read(self, size=-1):
+        if size < 0 or self.tell() > 0:
+            raise ConnectionResetError("connection reset by peer")
+        return io.BytesIO.read(self, 40)
+
+
+class DroppingTransport(object):
+    """Serve `pages` in order; the first download of each page breaks off."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def open(self, url):
+        token = url.partition("resumptionToken=")[2]
+        self.requests.append(token)
+        body = self.pages[token]
+        if self.requests.count(token) == 1:
+            return BrokenBody(body)
+        return io.BytesIO(body)
+
+
+def test_body_downloads_are_retried():
+    pages = {"": make_page(["a", "b"], token="t1"), "t1": make_page(["c"])}
+    for options in ({"parser": "tree"}, {"parser": "stream"}, {"prefetch": 2}):
+        transport = DroppingTransport(pages)
+        scraper = arxivscraper.Scraper(category="physics:cond-mat", t=0, transport=transport, **options)
+        assert [r["id"] for r in scraper.scrape()] == ["a", "b", "c"]
+        assert transport.requests == ["", "", "t1", "t1"]
+        assert scraper.retry.retries == 2
+
+
+def test_retries_are_counted_per_harvest():
+    transport = FlakyTransport([http_error(503, "0")])
+    scraper = arxivscraper.Scraper(category="physics:cond-mat", t=0, transport=transport)
+    scraper.scrape()
+    scraper.transport = FlakyTransport([http_error(503, "0")])
+    scraper.scrape()
+    assert scraper.retry.retries == 1
+
+    policy = RetryPolicy(backoff=0, budget=1)
+    policy.call(FlakyTransport([http_error(503)]).open, "url")
+    policy.reset()
+    assert policy.retries == 0
+    assert policy.call(FlakyTransport([http_error(503)]).open, "url").read()
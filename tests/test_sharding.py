@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from arxivscraper.sharding import ShardedScraper, date_windows
+from test_streaming import make_page
+
+
+class WindowTransport(object):
+    """Serve one page per window; record 'dup' shows up in every window."""
+
+    def open(self, url):
+        start = parse_qs(urlsplit(url).query)["from"][0]
+        return io.BytesIO(make_page([start, "dup"]))
+
+
+def test_date_windows():
+    assert date_windows("2017-01-15", "2017-03-02") == [
+        ("2017-01-15", "2017-01-31"),
+        ("2017-02-01", "2017-02-28"),
+        ("2017-03-01", "2017-03-02"),
+    ]
+    assert date_windows("2016-12-30", "2017-01-02", "year") == [
+        ("2016-12-30", "2016-12-31"),
+        ("2017-01-01", "2017-01-02"),
+    ]
+    assert len(date_windows("2017-01-01", "2017-01-10", "day")) == 10
+
+
+def test_sharded_scrape_is_ordered_and_deduplicated():
+    scraper = ShardedScraper(
+        category="physics:cond-mat",
+        date_from="2017-01-01",
+        date_until="2017-06-30",
+        workers=3,
+        interval=0,
+        transport=WindowTransport(),
+    )
+    ids = [record["id"] for record in scraper.scrape()]
+    assert ids == [
+        "2017-01-01", "dup", "2017-02-01", "2017-03-01",
+        "2017-04-01", "2017-05-01", "2017-06-01",
+    ]
+
+
+def test_per_harvest_state_is_rejected():
+    for option in ("checkpoint", "state"):
+        with pytest.raises(ValueError):
+            ShardedScraper(category="stat", date_from="2017-01-01", date_until="2017-03-01", **{option: "x.json"})
+
+
+def test_sharded_scrape_stops_at_incomplete_window():
+    cancel = threading.Event()
+
+    class CancellingTransport(object):
+        """The February window is cancelled after its first page."""
+
+        def open(self, url):
+            start = parse_qs(urlsplit(url).query).get("from", [None])[0]
+            if start == "2017-02-01":
+                cancel.set()
+                return io.BytesIO(make_page([start], token="t1"))
+            return io.BytesIO(make_page([start]))
+
+    scraper = ShardedScraper(
+        category="physics:cond-mat",
+        date_from="2017-01-01",
+        date_until="2017-04-30",
+        workers=1,
+        interval=0,
+        transport=CancellingTransport(),
+        cancel=cancel,
+    )
+    assert [record["id"] for record in scraper.scrape()] == ["2017-01-01", "2017-02-01"]
+    assert scraper.stopped == "cancelled"
+    assert scraper.stopped_window == ("2017-02-01", "2017-02-28")
+    assert scraper.resumption_token == "t1"
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.sinks import CSVSink, JSONLSink, Sink
+from arxivscraper.testing import FakeOAIServer
+
+
+def scraper(server, **kwargs):
+    return arxivscraper.Scraper(category="physics:cond-mat", base_url=server.url, **kwargs)
+
+
+def test_jsonl_and_csv_sinks(tmp_path):
+    jsonl = str(tmp_path / "out.jsonl.gz")
+    csv_path = str(tmp_path / "out.csv")
+    checkpoint = str(tmp_path / "checkpoint.json")
+    with FakeOAIServer(n_records=25, page_size=10) as server:
+        expected = scraper(server).scrape()
+        with JSONLSink(jsonl) as sink:
+            stats = scraper(server, checkpoint=checkpoint).scrape(sink=sink)
+            assert json.load(open(checkpoint))["emitted"] == 25
+        with CSVSink(csv_path, fields=["id", "authors"]) as sink:
+            scraper(server).scrape(sink=sink)
+    assert (stats["records"], stats["pages"]) == (25, 3)
+    with gzip.open(jsonl, "rt") as f:
+        assert [json.loads(line) for line in f] == expected
+    with open(csv_path) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "authors"]
+    assert rows[1] == [expected[0]["id"], "; ".join(expected[0]["authors"])]
+    assert len(rows) == 26
+
+
+def test_writer_errors_reach_the_producer():
+    class BrokenSink(Sink):
+        def _write_page(self, page):
+            raise IOError("disk full")
+
+    sink = BrokenSink()
+    sink.write([{"id": "1"}])
+    with pytest.raises(IOError):
+        sink.flush()
+    sink.close()
+
+
+def test_unopenable_path(tmp_path):
+    sink = JSONLSink(str(tmp_path / "missing" / "out.jsonl"), queue_size=1)
+    sink.write([{"id": "1"}])
+    with pytest.raises(IOError):
+        for _ in range(4):
+            sink.write([{"id": "2"}])
+    with pytest.raises(IOError):
+        sink.flush()
+    with pytest.raises(IOError):
+        sink.close()
+
+
+def test_parquet_sink(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from arxivscraper.sinks import ParquetSink
+
+    root = str(tmp_path / "dataset")
+    with FakeOAIServer(n_records=100, page_size=40) as server:
+        expected = scraper(server).scrape()
+        with ParquetSink(root, max_open_files=2) as sink:
+            stats = scraper(server).scrape(sink=sink)
+    assert stats["records"] == 100
+    table = pq.read_table(root)
+    assert sorted(table.column("id").to_pylist()) == sorted(r["id"] for r in expected)
+    months = os.listdir(root)
+    assert "month=2017-01" in months
+    assert table.schema.field("created").type == "date32[day]"
+    assert table.schema.field("authors").type.value_type == "string"
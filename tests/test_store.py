@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.store import ArxivStore
+from arxivscraper.testing import FakeOAIServer
+
+
+def record(id, updated="", title="graph neural networks"):
+    return {
+        "id": id,
+        "title": title,
+        "abstract": "we study spin glasses",
+        "categories": "cond-mat.dis-nn stat.ml",
+        "doi": "",
+        "created": "2017-05-28",
+        "updated": updated,
+        "authors": ["jane doe", "john smith"],
+        "affiliation": ["mit"],
+        "url": "https://arxiv.org/abs/" + id,
+    }
+
+
+def test_upsert_keeps_newest(tmp_path):
+    store = ArxivStore(str(tmp_path / "arxiv.db"))
+    assert store.upsert([record("1", "2017-06-01", "new title"), record("2")]) == 2
+    assert store.upsert([record("1", "", "old title")]) == 0
+    assert store.upsert([record("1", "2017-07-01", "newer title")]) == 1
+    assert len(store) == 2
+    assert store.get("1")["title"] == "newer title"
+    assert store.get("1")["authors"] == ["jane doe", "john smith"]
+    assert [r["id"] for r in store.by_author("Jane Doe")] == ["1", "2"]
+    assert [r["id"] for r in store.by_category("stat.ML")] == ["1", "2"]
+    assert [r["id"] for r in store.search_all("title", "newer", "title")] == ["1"]
+    assert store.search_all("title", "old") == []
+    store.close()
+
+
+def test_store_as_sink(tmp_path):
+    path = str(tmp_path / "arxiv.db")
+    with FakeOAIServer(n_records=30, page_size=10) as server:
+        scraper = arxivscraper.Scraper(category="physics:cond-mat", base_url=server.url)
+        expected = scraper.scrape()
+        with ArxivStore(path) as store:
+            scraper.scrape(sink=store)
+            scraper.scrape(sink=store)
+            store.flush()
+            assert len(store) == 30
+            assert store.get(expected[3]["id"]) == expected[3]
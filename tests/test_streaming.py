@@ -0,0 +1,141 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.testing import render_error
+
+RECORD = """<record><header><identifier>oai:arXiv.org:{id}</identifier></header>
+<metadata><arXiv xmlns="http://arxiv.org/OAI/arXiv/"><id>{id}</id>
+<created>2017-05-28</created><authors><author><keyname>Doe</keyname>
+<forenames>Jane</forenames></author></authors><title>Paper {id}</title>
+<categories>cond-mat.soft</categories><abstract>Abstract {id}</abstract>
+</arXiv></metadata></record>"""
+
+
+def make_page(ids, token=None):
+    """Build a ListRecords response holding the given record ids."""
+    records = "".join(RECORD.format(id=i) for i in ids)
+    tail = "<resumptionToken>%s</resumptionToken>" % token if token else ""
+    return (
+        '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+        "<ListRecords>%s%s</ListRecords></OAI-PMH>" % (records, tail)
+    ).encode()
+
+
+class FakeTransport(object):
+    """Serve `pages` in order, recording the requested urls."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def open(self, url):
+        self.requested.append(url)
+        return io.BytesIO(self.pages[len(self.requested) - 1])
+
+
+def test_iter_pages():
+    pages = [make_page(["1", "2"], token="t1"), make_page(["3"])]
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat", transport=FakeTransport(pages)
+    )
+    out = [[r["id"] for r in page] for page in scraper.iter_pages()]
+    assert out == [["1", "2"], ["3"]]
+
+
+def test_iter_records_is_lazy():
+    transport = FakeTransport([make_page(["1"], token="t1"), make_page(["2"])])
+    scraper = arxivscraper.Scraper(category="physics:cond-mat", transport=transport)
+    records = scraper.iter_records()
+    assert next(records)["id"] == "1"
+    assert len(transport.requested) == 1
+    assert [r["id"] for r in records] == ["2"]
+    assert transport.requested[1].endswith("resumptionToken=t1")
+
+
+def test_scrape_filters():
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat",
+        filters={"title": ["paper 2"]},
+        transport=FakeTransport([make_page(["1", "2"])]),
+    )
+    assert [r["id"] for r in scraper.scrape()] == ["2"]
+
+
+def test_stream_parser():
+    pages = [make_page(["1", "2"], token="t1"), make_page(["3"])]
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat", parser="stream", transport=FakeTransport(pages)
+    )
+    assert [r["id"] for r in scraper.scrape()] == ["1", "2", "3"]
+
+
+def test_stream_page_small_chunks():
+    from arxivscraper.parsing import StreamPage
+
+    page = StreamPage(io.BytesIO(make_page(["1", "2"], token="t1")), chunk_size=7)
+    ids = [record.find(".//{http://arxiv.org/OAI/arXiv/}id").text for record in page]
+    assert ids == ["1", "2"]
+    assert page.token == "t1"
+
+
+def test_record_is_lazy():
+    import xml.etree.ElementTree as ET
+
+    meta = ET.fromstring(make_page(["1"])).find(".//{http://arxiv.org/OAI/arXiv/}arXiv")
+    record = arxivscraper.Record(meta)
+    assert not hasattr(record, "__dict__")
+    assert record.output(["id", "categories"]) == {"id": "1", "categories": "cond-mat.soft"}
+    assert not hasattr(record, "_abstract")
+    record.materialize()
+    assert record.xml is None
+    assert record.abstract == "abstract 1"
+    assert record["authors"] == ["jane doe"]
+
+
+def test_fields_projection():
+    scraper = arxivscraper.Scraper(
+        category="physics:cond-mat",
+        filters={"title": ["paper 2"]},
+        fields=["id"],
+        transport=FakeTransport([make_page(["1", "2"])]),
+    )
+    assert scraper.scrape() == [{"id": "2"}]
+
+
+def test_author_entries():
+    import xml.etree.ElementTree as ET
+
+    meta = ET.fromstring(
+        '<arXiv xmlns="http://arxiv.org/OAI/arXiv/"><authors>'
+        "<author><keyname>Doe</keyname><forenames>Jane</forenames>"
+        "<affiliation>MIT</affiliation><affiliation>CERN</affiliation></author>"
+        "<author><keyname>Smith</keyname><suffix>Jr</suffix></author>"
+        "</authors></arXiv>"
+    )
+    record = arxivscraper.Record(meta)
+    assert record.author_entries == [
+        arxivscraper.Author("Doe", "Jane", None, ["MIT", "CERN"]),
+        arxivscraper.Author("Smith", None, "Jr", []),
+    ]
+    assert record.authors == ["jane doe", "n/a smith"]
+    assert record.affiliation == ["mit", "cern"]
+
+
+def test_oai_error_responses():
+    for parser in ("tree", "stream"):
+        transport = FakeTransport([render_error("noRecordsMatch")])
+        scraper = arxivscraper.Scraper(category="physics:cond-mat", transport=transport, parser=parser)
+        assert scraper.scrape() == []
+        assert scraper.complete
+
+        transport = FakeTransport([make_page(["1"], token="t1"), render_error("badResumptionToken")])
+        scraper = arxivscraper.Scraper(category="physics:cond-mat", transport=transport, parser=parser)
+        with pytest.raises(arxivscraper.OAIError, match="badResumptionToken"):
+            scraper.scrape()
+        assert not scraper.complete
@@ -0,0 +1,84 @@
+import gzip
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import arxivscraper
+from arxivscraper.transport import HTTPTransport, UrllibTransport
+
+BODY = b"<OAI-PMH>" + b"x" * 100000 + b"</OAI-PMH>"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = set()
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = BODY
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    Handler.connections.clear()
+    yield "http://127.0.0.1:%d" % httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_keep_alive_and_gzip(server):
+    transport = HTTPTransport()
+    for _ in range(3):
+        response = transport.open(server + "/oai")
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.read(9) + response.read() == BODY
+    assert len(Handler.connections) == 1
+    transport.close()
+
+
+def test_unread_response_is_not_reused(server):
+    transport = HTTPTransport(compress=False)
+    assert transport.open(server + "/oai").read(10) == BODY[:10]
+    assert transport.open(server + "/oai").read() == BODY
+    assert len(Handler.connections) == 2
+
+
+def test_http_error(server):
+    with pytest.raises(HTTPError) as e:
+        HTTPTransport().open(server + "/missing")
+    assert e.value.code == 404
+
+
+def test_default_transport_honours_proxy_settings(monkeypatch):
+    for name in ("http_proxy", "https_proxy", "no_proxy", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    assert isinstance(arxivscraper.Scraper(category="stat").transport, HTTPTransport)
+    monkeypatch.setenv("http_proxy", "http://proxy.example:3128")
+    assert isinstance(arxivscraper.Scraper(category="stat").transport, UrllibTransport)
+    monkeypatch.setenv("no_proxy", "export.arxiv.org")
+    assert isinstance(arxivscraper.Scraper(category="stat").transport, HTTPTransport)